@@ -1,5 +1,7 @@
 """Application configuration"""
+import functools
 import os
+import types
 from pathlib import Path
 
 # Application Info
@@ -10,26 +12,36 @@ APP_VERSION = "2.0.0"
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 ASSETS_DIR = BASE_DIR / "assets"
-BACKUP_DIR = Path.home() / "Google Drive" / "Billing Backup"
 
 # Database
 DB_PATH = DATA_DIR / "billing.db"
 
-# Ensure directories exist
-DATA_DIR.mkdir(exist_ok=True)
+
+@functools.cache
+def backup_dir() -> Path:
+    """Default Google Drive backup folder (resolved on first use)"""
+    return Path.home() / "Google Drive" / "Billing Backup"
+
+
+@functools.cache
+def ensure_data_dir() -> Path:
+    """Create the data directory on first use and return it"""
+    DATA_DIR.mkdir(exist_ok=True)
+    return DATA_DIR
+
 
 # GST Settings
-GST_RATES = [0, 5, 12, 18, 28]
+GST_RATES = (0, 5, 12, 18, 28)
 DEFAULT_GST_RATE = 18.0
 
 # State Codes (India)
-STATE_CODES = {
+STATE_CODES = types.MappingProxyType({
     "32": "Kerala",
     "33": "Tamil Nadu",
     "29": "Karnataka",
     "27": "Maharashtra",
     "07": "Delhi",
-}
+})
 DEFAULT_STATE_CODE = "32"  # Kerala
 
 # Invoice Settings
@@ -37,10 +49,10 @@ INVOICE_PREFIX = "INV"
 FINANCIAL_YEAR_START_MONTH = 4  # April
 
 # Units
-UNITS = ["NOS", "KG", "GM", "LTR", "ML", "MTR", "CM", "SQM", "BOX", "PKT", "PCS"]
+UNITS = ("NOS", "KG", "GM", "LTR", "ML", "MTR", "CM", "SQM", "BOX", "PKT", "PCS")
 
 # Payment Modes
-PAYMENT_MODES = ["CASH", "UPI", "CARD", "CREDIT", "BANK TRANSFER"]
+PAYMENT_MODES = ("CASH", "UPI", "CARD", "CREDIT", "BANK TRANSFER")
 
 # UI Settings
 WINDOW_WIDTH = 1200
@@ -1,383 +1,659 @@
 """Database connection and initialization"""
+import atexit
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
 from pathlib import Path
-from config import DB_PATH
+from config import DB_PATH, ensure_data_dir
+
+# Bump whenever SCHEMA_SQL, INDEX_SQL, FTS_SQL, COUNTER_SQL or DESIRED_COLUMNS change so
+# that existing databases run the bootstrap in init_db() again
+CURRENT_SCHEMA_VERSION = 19
+
+# Columns added after the original schema, applied by init_db() when missing
+DESIRED_COLUMNS = {
+    'products': [
+        ('category_id', 'INTEGER REFERENCES categories(id)'),
+        ('purchase_price', 'REAL DEFAULT 0'),  # for profit calculation
+        # <= 0 means low stock; indexed so get_low_stock() is a range scan
+        ('stock_deficit', 'REAL GENERATED ALWAYS AS (stock_qty - low_stock_alert) VIRTUAL'),
+    ],
+    'customers': [
+        ('credit_balance', 'REAL DEFAULT 0'),
+        ('credit_limit', 'REAL DEFAULT 0'),
+        ('pin_code', 'TEXT'),  # for e-Way Bill
+    ],
+    'invoices': [
+        ('amount_paid', 'REAL DEFAULT 0'),
+        ('balance_due', 'REAL DEFAULT 0'),
+        # e-Way Bill related columns
+        ('vehicle_number', 'TEXT'),
+        ('transport_mode', "TEXT DEFAULT 'Road'"),
+        ('transport_distance', 'INTEGER DEFAULT 0'),
+        ('transporter_id', 'TEXT'),
+        ('eway_bill_number', 'TEXT'),
+        ('payment_status', "TEXT DEFAULT 'PAID'"),
+    ],
+    'invoice_items': [
+        ('line_no', 'INTEGER'),  # 1-based position, key for item upserts
+    ],
+}
+
+# Tables, created in dependency order
+SCHEMA_SQL = """
+-- Company/Shop Details
+CREATE TABLE IF NOT EXISTS company (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    address TEXT,
+    gstin TEXT,
+    state_code TEXT DEFAULT '32',
+    phone TEXT,
+    email TEXT,
+    bank_details TEXT,
+    logo_path TEXT
+);
+
+-- Products/Items
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    barcode TEXT UNIQUE,
+    hsn_code TEXT,
+    unit TEXT DEFAULT 'NOS',
+    price REAL NOT NULL,
+    gst_rate REAL DEFAULT 18.0,
+    stock_qty REAL DEFAULT 0,
+    low_stock_alert REAL DEFAULT 10,
+    is_active INTEGER DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Customers
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT,
+    address TEXT,
+    gstin TEXT,
+    state_code TEXT DEFAULT '32',
+    is_active INTEGER DEFAULT 1
+);
+
+-- Invoices
+CREATE TABLE IF NOT EXISTS invoices (
+    id INTEGER PRIMARY KEY,
+    invoice_number TEXT UNIQUE NOT NULL,
+    invoice_date DATE NOT NULL,
+    customer_id INTEGER,
+    customer_name TEXT,
+    subtotal REAL,
+    cgst_total REAL,
+    sgst_total REAL,
+    igst_total REAL,
+    discount REAL DEFAULT 0,
+    grand_total REAL,
+    payment_mode TEXT DEFAULT 'CASH',
+    is_cancelled INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+);
+
+-- Invoice Line Items
+CREATE TABLE IF NOT EXISTS invoice_items (
+    id INTEGER PRIMARY KEY,
+    invoice_id INTEGER NOT NULL,
+    product_id INTEGER,
+    product_name TEXT,
+    hsn_code TEXT,
+    qty REAL,
+    unit TEXT,
+    rate REAL,
+    gst_rate REAL,
+    taxable_value REAL,
+    cgst REAL,
+    sgst REAL,
+    igst REAL,
+    total REAL,
+    FOREIGN KEY (invoice_id) REFERENCES invoices(id),
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+-- Stock Movement Log
+CREATE TABLE IF NOT EXISTS stock_log (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER,
+    change_qty REAL,
+    reason TEXT,
+    reference_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Product Categories
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    description TEXT,
+    is_active INTEGER DEFAULT 1
+);
+
+-- Held Bills (for hold/recall feature)
+CREATE TABLE IF NOT EXISTS held_bills (
+    id INTEGER PRIMARY KEY,
+    hold_name TEXT,
+    customer_id INTEGER,
+    customer_name TEXT,
+    items_json TEXT,
+    discount REAL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+);
+
+-- App Settings (for password, preferences, etc.); always read by key
+CREATE TABLE IF NOT EXISTS app_settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+
+-- Invoice Payments table (for split payments)
+CREATE TABLE IF NOT EXISTS invoice_payments (
+    id INTEGER PRIMARY KEY,
+    invoice_id INTEGER NOT NULL,
+    payment_mode TEXT NOT NULL,
+    amount REAL NOT NULL,
+    payment_date DATE NOT NULL,
+    reference_number TEXT,
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (invoice_id) REFERENCES invoices(id)
+);
+
+-- Credit Notes table
+CREATE TABLE IF NOT EXISTS credit_notes (
+    id INTEGER PRIMARY KEY,
+    credit_note_number TEXT UNIQUE NOT NULL,
+    credit_note_date DATE NOT NULL,
+    original_invoice_id INTEGER,
+    original_invoice_number TEXT,
+    customer_id INTEGER,
+    customer_name TEXT,
+    reason TEXT NOT NULL,
+    reason_details TEXT,
+    subtotal REAL,
+    cgst_total REAL,
+    sgst_total REAL,
+    igst_total REAL,
+    grand_total REAL,
+    status TEXT DEFAULT 'ACTIVE',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (original_invoice_id) REFERENCES invoices(id),
+    FOREIGN KEY (customer_id) REFERENCES customers(id)
+);
+
+-- Credit Note Items table
+CREATE TABLE IF NOT EXISTS credit_note_items (
+    id INTEGER PRIMARY KEY,
+    credit_note_id INTEGER NOT NULL,
+    product_id INTEGER,
+    product_name TEXT,
+    hsn_code TEXT,
+    qty REAL,
+    unit TEXT,
+    rate REAL,
+    gst_rate REAL,
+    taxable_value REAL,
+    cgst REAL,
+    sgst REAL,
+    igst REAL,
+    total REAL,
+    FOREIGN KEY (credit_note_id) REFERENCES credit_notes(id),
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+-- Quotations table
+CREATE TABLE IF NOT EXISTS quotations (
+    id INTEGER PRIMARY KEY,
+    quotation_number TEXT UNIQUE NOT NULL,
+    quotation_date DATE NOT NULL,
+    validity_date DATE NOT NULL,
+    customer_id INTEGER,
+    customer_name TEXT,
+    subtotal REAL,
+    cgst_total REAL,
+    sgst_total REAL,
+    igst_total REAL,
+    discount REAL DEFAULT 0,
+    grand_total REAL,
+    status TEXT DEFAULT 'DRAFT',
+    notes TEXT,
+    terms_conditions TEXT,
+    converted_invoice_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (customer_id) REFERENCES customers(id),
+    FOREIGN KEY (converted_invoice_id) REFERENCES invoices(id)
+);
+
+-- Quotation Items table
+CREATE TABLE IF NOT EXISTS quotation_items (
+    id INTEGER PRIMARY KEY,
+    quotation_id INTEGER NOT NULL,
+    product_id INTEGER,
+    product_name TEXT,
+    hsn_code TEXT,
+    qty REAL,
+    unit TEXT,
+    rate REAL,
+    gst_rate REAL,
+    taxable_value REAL,
+    cgst REAL,
+    sgst REAL,
+    igst REAL,
+    total REAL,
+    FOREIGN KEY (quotation_id) REFERENCES quotations(id),
+    FOREIGN KEY (product_id) REFERENCES products(id)
+);
+
+-- Email Queue table (for offline email support)
+CREATE TABLE IF NOT EXISTS email_queue (
+    id INTEGER PRIMARY KEY,
+    invoice_id INTEGER NOT NULL,
+    recipient_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT DEFAULT 'PENDING',
+    retry_count INTEGER DEFAULT 0,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+    FOREIGN KEY (invoice_id) REFERENCES invoices(id)
+);
+
+-- Attachments are kept apart so queue status updates never rewrite the PDF
+CREATE TABLE IF NOT EXISTS email_queue_pdfs (
+    entry_id INTEGER PRIMARY KEY REFERENCES email_queue(id) ON DELETE CASCADE,
+    pdf_data BLOB NOT NULL
+);
+
+-- Last number issued per document prefix (e.g. INV/2024-25/)
+CREATE TABLE IF NOT EXISTS invoice_counters (
+    prefix TEXT PRIMARY KEY,
+    last_num INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Created after column migrations, since some index late-added columns
+INDEX_SQL = "\n".join([
+    # barcode and invoice_number are UNIQUE, so their autoindexes serve lookups
+    "DROP INDEX IF EXISTS idx_products_barcode;",
+    "CREATE INDEX IF NOT EXISTS idx_products_name ON products(name);",
+    "CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);",
+    "CREATE INDEX IF NOT EXISTS idx_products_deficit ON products(stock_deficit) WHERE is_active = 1;",
+    "CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name);",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date);",
+    "DROP INDEX IF EXISTS idx_invoices_number;",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer_id);",
+    "CREATE INDEX IF NOT EXISTS idx_invoice_payments_invoice ON invoice_payments(invoice_id);",
+    "CREATE INDEX IF NOT EXISTS idx_invoice_payments_date ON invoice_payments(payment_date);",
+    "CREATE INDEX IF NOT EXISTS idx_credit_notes_date ON credit_notes(credit_note_date);",
+    "DROP INDEX IF EXISTS idx_credit_notes_invoice;",
+    "CREATE INDEX IF NOT EXISTS idx_credit_notes_invoice_date ON credit_notes(original_invoice_id, credit_note_date);",
+    "CREATE INDEX IF NOT EXISTS idx_credit_notes_customer ON credit_notes(customer_id);",
+    # Quotation list filters: date range (+ status), customer, status (+ validity);
+    # grand_total makes the date range index cover the per-status summary
+    "DROP INDEX IF EXISTS idx_quotations_date;",
+    "DROP INDEX IF EXISTS idx_quotations_date_status;",
+    "CREATE INDEX IF NOT EXISTS idx_quotations_date_status_total ON quotations(quotation_date, status, grand_total);",
+    "DROP INDEX IF EXISTS idx_quotations_status;",
+    "CREATE INDEX IF NOT EXISTS idx_quotations_status_validity ON quotations(status, validity_date);",
+    "DROP INDEX IF EXISTS idx_quotations_customer;",
+    "CREATE INDEX IF NOT EXISTS idx_quotations_customer_date ON quotations(customer_id, quotation_date);",
+    # Pending and retryable entries, already in send order
+    "DROP INDEX IF EXISTS idx_email_queue_status;",
+    "DROP INDEX IF EXISTS idx_email_queue_status_pending;",
+    "CREATE INDEX IF NOT EXISTS idx_email_queue_pending ON email_queue(status, retry_count, created_at);",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_date_cov ON invoices(invoice_date, is_cancelled) WHERE is_cancelled = 0;",
+    "DROP INDEX IF EXISTS idx_invoice_items_invoice;",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_invoice_items_line ON invoice_items(invoice_id, line_no);",
+    "CREATE INDEX IF NOT EXISTS idx_stock_log_product ON stock_log(product_id, created_at);",
+    "CREATE INDEX IF NOT EXISTS idx_credit_note_items_cn ON credit_note_items(credit_note_id);",
+    "CREATE INDEX IF NOT EXISTS idx_quotation_items_q ON quotation_items(quotation_id);",
+    "CREATE INDEX IF NOT EXISTS idx_invoice_payments_mode ON invoice_payments(invoice_id, payment_mode);",
+])
+
+# Numbers items saved before line_no existed in their original order
+INVOICE_ITEM_LINE_NO_SQL = """
+UPDATE invoice_items SET line_no = (
+    SELECT COUNT(*) FROM invoice_items AS prev
+    WHERE prev.invoice_id = invoice_items.invoice_id AND prev.id <= invoice_items.id
+) WHERE line_no IS NULL;
+"""
+
+# Full-text indexes over products and customers for search-as-you-type,
+# kept in sync by triggers and rebuilt from the base tables on bootstrap
+FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, barcode, content='products', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+    INSERT INTO products_fts (rowid, name, barcode) VALUES (new.id, new.name, new.barcode);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, barcode)
+    VALUES ('delete', old.id, old.name, old.barcode);
+END;
+CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, barcode ON products BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, barcode)
+    VALUES ('delete', old.id, old.name, old.barcode);
+    INSERT INTO products_fts (rowid, name, barcode) VALUES (new.id, new.name, new.barcode);
+END;
+INSERT INTO products_fts (products_fts) VALUES ('rebuild');
+
+CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts USING fts5(
+    name, phone, content='customers', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS customers_fts_ai AFTER INSERT ON customers BEGIN
+    INSERT INTO customers_fts (rowid, name, phone) VALUES (new.id, new.name, new.phone);
+END;
+CREATE TRIGGER IF NOT EXISTS customers_fts_ad AFTER DELETE ON customers BEGIN
+    INSERT INTO customers_fts (customers_fts, rowid, name, phone)
+    VALUES ('delete', old.id, old.name, old.phone);
+END;
+CREATE TRIGGER IF NOT EXISTS customers_fts_au AFTER UPDATE OF name, phone ON customers BEGIN
+    INSERT INTO customers_fts (customers_fts, rowid, name, phone)
+    VALUES ('delete', old.id, old.name, old.phone);
+    INSERT INTO customers_fts (rowid, name, phone) VALUES (new.id, new.name, new.phone);
+END;
+INSERT INTO customers_fts (customers_fts) VALUES ('rebuild');
+"""
+
+# Keeps invoice_counters at the highest saved number per prefix, so the next
+# number is a primary key lookup. The prefix is everything before the trailing
+# digits; WHERE true lets the backfill's SELECT take an upsert clause.
+COUNTER_SQL = """
+CREATE TRIGGER IF NOT EXISTS invoices_counter_ai AFTER INSERT ON invoices BEGIN
+    INSERT INTO invoice_counters (prefix, last_num)
+    VALUES (rtrim(new.invoice_number, '0123456789'),
+            CAST(substr(new.invoice_number,
+                        length(rtrim(new.invoice_number, '0123456789')) + 1) AS INTEGER))
+    ON CONFLICT(prefix) DO UPDATE SET last_num = max(last_num, excluded.last_num);
+END;
+INSERT INTO invoice_counters (prefix, last_num)
+    SELECT rtrim(invoice_number, '0123456789'),
+           MAX(CAST(substr(invoice_number,
+                           length(rtrim(invoice_number, '0123456789')) + 1) AS INTEGER))
+    FROM invoices WHERE true GROUP BY 1
+    ON CONFLICT(prefix) DO UPDATE SET last_num = max(last_num, excluded.last_num);
+
+CREATE TRIGGER IF NOT EXISTS credit_notes_counter_ai AFTER INSERT ON credit_notes BEGIN
+    INSERT INTO invoice_counters (prefix, last_num)
+    VALUES (rtrim(new.credit_note_number, '0123456789'),
+            CAST(substr(new.credit_note_number,
+                        length(rtrim(new.credit_note_number, '0123456789')) + 1) AS INTEGER))
+    ON CONFLICT(prefix) DO UPDATE SET last_num = max(last_num, excluded.last_num);
+END;
+INSERT INTO invoice_counters (prefix, last_num)
+    SELECT rtrim(credit_note_number, '0123456789'),
+           MAX(CAST(substr(credit_note_number,
+                           length(rtrim(credit_note_number, '0123456789')) + 1) AS INTEGER))
+    FROM credit_notes WHERE true GROUP BY 1
+    ON CONFLICT(prefix) DO UPDATE SET last_num = max(last_num, excluded.last_num);
+
+CREATE TRIGGER IF NOT EXISTS quotations_counter_ai AFTER INSERT ON quotations BEGIN
+    INSERT INTO invoice_counters (prefix, last_num)
+    VALUES (rtrim(new.quotation_number, '0123456789'),
+            CAST(substr(new.quotation_number,
+                        length(rtrim(new.quotation_number, '0123456789')) + 1) AS INTEGER))
+    ON CONFLICT(prefix) DO UPDATE SET last_num = max(last_num, excluded.last_num);
+END;
+INSERT INTO invoice_counters (prefix, last_num)
+    SELECT rtrim(quotation_number, '0123456789'),
+           MAX(CAST(substr(quotation_number,
+                           length(rtrim(quotation_number, '0123456789')) + 1) AS INTEGER))
+    FROM quotations WHERE true GROUP BY 1
+    ON CONFLICT(prefix) DO UPDATE SET last_num = max(last_num, excluded.last_num);
+"""
+
+# Rebuilds a rowid app_settings table as WITHOUT ROWID, keeping its rows
+APP_SETTINGS_REBUILD_SQL = """
+CREATE TABLE app_settings_new (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+INSERT INTO app_settings_new (key, value)
+    SELECT key, value FROM app_settings WHERE key IS NOT NULL;
+DROP TABLE app_settings;
+ALTER TABLE app_settings_new RENAME TO app_settings;
+"""
+
+# Moves inline email_queue attachments into email_queue_pdfs
+EMAIL_QUEUE_PDF_MOVE_SQL = """
+INSERT OR IGNORE INTO email_queue_pdfs (entry_id, pdf_data)
+    SELECT id, pdf_data FROM email_queue WHERE pdf_data IS NOT NULL;
+UPDATE email_queue SET pdf_data = NULL WHERE pdf_data IS NOT NULL;
+"""
+
+# Default categories; UNIQUE(name) makes this a no-op once they exist
+DEFAULT_CATEGORIES_SQL = """
+INSERT INTO categories (name, description) VALUES
+    ('General', 'Default category'),
+    ('Electronics', 'Electronic items'),
+    ('Groceries', 'Food and grocery items'),
+    ('Stationery', 'Office and school supplies'),
+    ('Clothing', 'Apparel and garments')
+ON CONFLICT(name) DO NOTHING;
+"""
+
+# Dates bind and load as date/datetime objects; columns declared DATE or TIMESTAMP
+# hold ISO text, so range comparisons on them still work
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value[:10].decode()))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+# WAL mode is persistent in the database header, so it only needs setting once
+_wal_set = False
+
+# One connection per thread, reused across get_connection() calls
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+
+class _SharedConnection(sqlite3.Connection):
+    """Connection cached per thread by get_connection()
+
+    close() only discards uncommitted work, as closing a private connection
+    would, and keeps the handle open for the next caller on this thread.
+    Threads that finish with the database release it with close_connection().
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
 
 
 def get_connection() -> sqlite3.Connection:
-    """Get a database connection with row factory enabled"""
-    conn = sqlite3.connect(DB_PATH)
+    """Get this thread's database connection with row factory enabled"""
+    global _wal_set
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.generation == _generation:
+        return conn
+
+    ensure_data_dir()
+    # A larger statement cache lets repeated lookups skip re-preparing their SQL
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=_SharedConnection,
+                           cached_statements=256, detect_types=sqlite3.PARSE_DECLTYPES)
     conn.row_factory = sqlite3.Row
+    if not _wal_set:
+        conn.execute("PRAGMA journal_mode = WAL")
+        _wal_set = True
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 268435456")  # 256 MB
+    conn.execute("PRAGMA cache_size = -64000")  # 64 MB
     conn.execute("PRAGMA foreign_keys = ON")
+
+    with _connections_lock:
+        _connections.append(conn)
+    _local.conn = conn
+    _local.generation = _generation
     return conn
 
 
+def close_connection():
+    """Close this thread's cached connection, e.g. as a background thread exits"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+            sqlite3.Connection.close(conn)
+
+
+def close_connections():
+    """Close every cached connection, e.g. before the database file is replaced
+
+    Closing the last connection checkpoints the WAL into the main file.
+    Threads open a fresh connection on their next get_connection() call,
+    which sets WAL again in case the file was replaced by one without it.
+    """
+    global _generation, _wal_set
+    with _connections_lock:
+        for conn in _connections:
+            sqlite3.Connection.close(conn)
+        _connections.clear()
+        _generation += 1
+        _wal_set = False
+
+
+atexit.register(close_connections)
+
+
+class ConnectionPool:
+    """Read-only connections shared by all threads for list and search queries
+
+    WAL lets these read while another thread's connection is writing, so UI
+    refreshes do not queue behind an invoice save. Model writes go through
+    the writer thread in database.writer.
+    """
+
+    def __init__(self, size: int = 4):
+        self._idle = queue.Queue(maxsize=size)
+
+    def _open_reader(self):
+        """Open a read-only connection and register it for close_connections()"""
+        conn = sqlite3.connect(DB_PATH.resolve().as_uri() + "?mode=ro", uri=True,
+                               check_same_thread=False, cached_statements=256,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")  # 256 MB
+        conn.execute("PRAGMA cache_size = -64000")  # 64 MB
+        with _connections_lock:
+            _connections.append(conn)
+            return conn, _generation
+
+    def _discard(self, conn: sqlite3.Connection):
+        """Close a reader that does not fit back into the pool"""
+        with _connections_lock:
+            if conn in _connections:
+                _connections.remove(conn)
+        conn.close()
+
+    @contextmanager
+    def acquire_read(self):
+        """Check out a read-only connection; opens an extra one if all are busy"""
+        own = getattr(_local, 'conn', None)
+        if own is not None and _local.generation == _generation and own.in_transaction:
+            # Reads issued mid-transaction must see that transaction's own writes
+            yield own
+            return
+        conn = None
+        while conn is None:
+            try:
+                conn, generation = self._idle.get_nowait()
+            except queue.Empty:
+                conn, generation = self._open_reader()
+            if generation != _generation:
+                # Already closed by close_connections()
+                conn = None
+        try:
+            yield conn
+        finally:
+            if generation == _generation:
+                try:
+                    self._idle.put_nowait((conn, generation))
+                except queue.Full:
+                    self._discard(conn)
+
+
+pool = ConnectionPool()
+
+
+def read_blob(conn: sqlite3.Connection, table: str, column: str, rowid: int) -> bytes:
+    """Read one BLOB through incremental I/O, or a plain SELECT before Python 3.11"""
+    if hasattr(conn, 'blobopen'):
+        with conn.blobopen(table, column, rowid, readonly=True) as blob:
+            return blob.read()
+    return conn.execute(f"SELECT {column} FROM {table} WHERE rowid = ?", (rowid,)).fetchone()[0]
+
+
+def _existing_cols(cursor: sqlite3.Cursor, table: str) -> set:
+    """Get the column names currently defined on a table"""
+    # table_xinfo also reports generated columns, which table_info hides
+    return {row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})")}
+
+
 def init_db():
     """Initialize database with schema"""
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Company/Shop Details
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS company (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            address TEXT,
-            gstin TEXT,
-            state_code TEXT DEFAULT '32',
-            phone TEXT,
-            email TEXT,
-            bank_details TEXT,
-            logo_path TEXT
-        )
-    """)
-
-    # Products/Items
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            barcode TEXT UNIQUE,
-            hsn_code TEXT,
-            unit TEXT DEFAULT 'NOS',
-            price REAL NOT NULL,
-            gst_rate REAL DEFAULT 18.0,
-            stock_qty REAL DEFAULT 0,
-            low_stock_alert REAL DEFAULT 10,
-            is_active INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Customers
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            phone TEXT,
-            address TEXT,
-            gstin TEXT,
-            state_code TEXT DEFAULT '32',
-            is_active INTEGER DEFAULT 1
-        )
-    """)
-
-    # Invoices
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS invoices (
-            id INTEGER PRIMARY KEY,
-            invoice_number TEXT UNIQUE NOT NULL,
-            invoice_date DATE NOT NULL,
-            customer_id INTEGER,
-            customer_name TEXT,
-            subtotal REAL,
-            cgst_total REAL,
-            sgst_total REAL,
-            igst_total REAL,
-            discount REAL DEFAULT 0,
-            grand_total REAL,
-            payment_mode TEXT DEFAULT 'CASH',
-            is_cancelled INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (customer_id) REFERENCES customers(id)
-        )
-    """)
-
-    # Invoice Line Items
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS invoice_items (
-            id INTEGER PRIMARY KEY,
-            invoice_id INTEGER NOT NULL,
-            product_id INTEGER,
-            product_name TEXT,
-            hsn_code TEXT,
-            qty REAL,
-            unit TEXT,
-            rate REAL,
-            gst_rate REAL,
-            taxable_value REAL,
-            cgst REAL,
-            sgst REAL,
-            igst REAL,
-            total REAL,
-            FOREIGN KEY (invoice_id) REFERENCES invoices(id),
-            FOREIGN KEY (product_id) REFERENCES products(id)
-        )
-    """)
-
-    # Stock Movement Log
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS stock_log (
-            id INTEGER PRIMARY KEY,
-            product_id INTEGER,
-            change_qty REAL,
-            reason TEXT,
-            reference_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # Product Categories
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL UNIQUE,
-            description TEXT,
-            is_active INTEGER DEFAULT 1
-        )
-    """)
-
-    # Add category_id to products if not exists
-    try:
-        cursor.execute("ALTER TABLE products ADD COLUMN category_id INTEGER REFERENCES categories(id)")
-    except sqlite3.OperationalError:
-        pass  # Column already exists
-
-    # Add purchase_price to products if not exists (for profit calculation)
-    try:
-        cursor.execute("ALTER TABLE products ADD COLUMN purchase_price REAL DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass
-
-    # Add credit_balance to customers if not exists
-    try:
-        cursor.execute("ALTER TABLE customers ADD COLUMN credit_balance REAL DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass
-
-    # Add credit_limit to customers if not exists
-    try:
-        cursor.execute("ALTER TABLE customers ADD COLUMN credit_limit REAL DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass
-
-    # Held Bills (for hold/recall feature)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS held_bills (
-            id INTEGER PRIMARY KEY,
-            hold_name TEXT,
-            customer_id INTEGER,
-            customer_name TEXT,
-            items_json TEXT,
-            discount REAL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (customer_id) REFERENCES customers(id)
-        )
-    """)
-
-    # App Settings (for password, preferences, etc.)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS app_settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-    """)
-
-    # Add amount_paid and balance to invoices if not exists
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN amount_paid REAL DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass
-
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN balance_due REAL DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass
-
-    # Add e-Way Bill related columns to invoices
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN vehicle_number TEXT")
-    except sqlite3.OperationalError:
-        pass
-
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN transport_mode TEXT DEFAULT 'Road'")
-    except sqlite3.OperationalError:
-        pass
-
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN transport_distance INTEGER DEFAULT 0")
-    except sqlite3.OperationalError:
-        pass
-
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN transporter_id TEXT")
-    except sqlite3.OperationalError:
-        pass
-
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN eway_bill_number TEXT")
-    except sqlite3.OperationalError:
-        pass
-
-    # Add PIN code to customers for e-Way Bill
-    try:
-        cursor.execute("ALTER TABLE customers ADD COLUMN pin_code TEXT")
-    except sqlite3.OperationalError:
-        pass
-
-    # Add payment_status to invoices
-    try:
-        cursor.execute("ALTER TABLE invoices ADD COLUMN payment_status TEXT DEFAULT 'PAID'")
-    except sqlite3.OperationalError:
-        pass
-
-    # Invoice Payments table (for split payments)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS invoice_payments (
-            id INTEGER PRIMARY KEY,
-            invoice_id INTEGER NOT NULL,
-            payment_mode TEXT NOT NULL,
-            amount REAL NOT NULL,
-            payment_date DATE NOT NULL,
-            reference_number TEXT,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (invoice_id) REFERENCES invoices(id)
-        )
-    """)
-
-    # Credit Notes table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS credit_notes (
-            id INTEGER PRIMARY KEY,
-            credit_note_number TEXT UNIQUE NOT NULL,
-            credit_note_date DATE NOT NULL,
-            original_invoice_id INTEGER,
-            original_invoice_number TEXT,
-            customer_id INTEGER,
-            customer_name TEXT,
-            reason TEXT NOT NULL,
-            reason_details TEXT,
-            subtotal REAL,
-            cgst_total REAL,
-            sgst_total REAL,
-            igst_total REAL,
-            grand_total REAL,
-            status TEXT DEFAULT 'ACTIVE',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (original_invoice_id) REFERENCES invoices(id),
-            FOREIGN KEY (customer_id) REFERENCES customers(id)
-        )
-    """)
-
-    # Credit Note Items table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS credit_note_items (
-            id INTEGER PRIMARY KEY,
-            credit_note_id INTEGER NOT NULL,
-            product_id INTEGER,
-            product_name TEXT,
-            hsn_code TEXT,
-            qty REAL,
-            unit TEXT,
-            rate REAL,
-            gst_rate REAL,
-            taxable_value REAL,
-            cgst REAL,
-            sgst REAL,
-            igst REAL,
-            total REAL,
-            FOREIGN KEY (credit_note_id) REFERENCES credit_notes(id),
-            FOREIGN KEY (product_id) REFERENCES products(id)
-        )
-    """)
-
-    # Quotations table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS quotations (
-            id INTEGER PRIMARY KEY,
-            quotation_number TEXT UNIQUE NOT NULL,
-            quotation_date DATE NOT NULL,
-            validity_date DATE NOT NULL,
-            customer_id INTEGER,
-            customer_name TEXT,
-            subtotal REAL,
-            cgst_total REAL,
-            sgst_total REAL,
-            igst_total REAL,
-            discount REAL DEFAULT 0,
-            grand_total REAL,
-            status TEXT DEFAULT 'DRAFT',
-            notes TEXT,
-            terms_conditions TEXT,
-            converted_invoice_id INTEGER,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (customer_id) REFERENCES customers(id),
-            FOREIGN KEY (converted_invoice_id) REFERENCES invoices(id)
-        )
-    """)
-
-    # Quotation Items table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS quotation_items (
-            id INTEGER PRIMARY KEY,
-            quotation_id INTEGER NOT NULL,
-            product_id INTEGER,
-            product_name TEXT,
-            hsn_code TEXT,
-            qty REAL,
-            unit TEXT,
-            rate REAL,
-            gst_rate REAL,
-            taxable_value REAL,
-            cgst REAL,
-            sgst REAL,
-            igst REAL,
-            total REAL,
-            FOREIGN KEY (quotation_id) REFERENCES quotations(id),
-            FOREIGN KEY (product_id) REFERENCES products(id)
-        )
-    """)
-
-    # Email Queue table (for offline email support)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS email_queue (
-            id INTEGER PRIMARY KEY,
-            invoice_id INTEGER NOT NULL,
-            recipient_email TEXT NOT NULL,
-            subject TEXT NOT NULL,
-            body TEXT NOT NULL,
-            pdf_data BLOB,
-            status TEXT DEFAULT 'PENDING',
-            retry_count INTEGER DEFAULT 0,
-            error_message TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            sent_at TIMESTAMP,
-            FOREIGN KEY (invoice_id) REFERENCES invoices(id)
-        )
-    """)
-
-    # Create indexes for faster lookups
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_barcode ON products(barcode)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products(name)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_number ON invoices(invoice_number)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_customer ON invoices(customer_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_payments_invoice ON invoice_payments(invoice_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_payments_date ON invoice_payments(payment_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_credit_notes_date ON credit_notes(credit_note_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_credit_notes_invoice ON credit_notes(original_invoice_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_credit_notes_customer ON credit_notes(customer_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quotations_date ON quotations(quotation_date)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quotations_status ON quotations(status)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quotations_customer ON quotations(customer_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_email_queue_status ON email_queue(status)")
-
-    # Insert default categories if empty
-    cursor.execute("SELECT COUNT(*) FROM categories")
-    if cursor.fetchone()[0] == 0:
-        default_categories = [
-            ('General', 'Default category'),
-            ('Electronics', 'Electronic items'),
-            ('Groceries', 'Food and grocery items'),
-            ('Stationery', 'Office and school supplies'),
-            ('Clothing', 'Apparel and garments'),
-        ]
-        cursor.executemany("INSERT INTO categories (name, description) VALUES (?, ?)", default_categories)
-
-    conn.commit()
+    # Skip the bootstrap entirely when the schema is already current
+    cursor.execute("CREATE TABLE IF NOT EXISTS app_settings (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID")
+    row = cursor.execute("SELECT value FROM app_settings WHERE key = 'schema_version'").fetchone()
+    if row and int(row[0]) >= CURRENT_SCHEMA_VERSION:
+        conn.close()
+        return
+
+    # Add columns introduced after the original schema. Tables that do not
+    # exist yet report no columns, and their CREATE TABLE omits these too.
+    migrations = []
+    for table, columns in DESIRED_COLUMNS.items():
+        existing = _existing_cols(cursor, table)
+        for name, decl in columns:
+            if name not in existing:
+                migrations.append(f"ALTER TABLE {table} ADD COLUMN {name} {decl};")
+
+    # Older databases created app_settings as a rowid table
+    settings_sql = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'app_settings'"
+    ).fetchone()[0]
+    if 'WITHOUT ROWID' not in settings_sql.upper():
+        migrations.insert(0, APP_SETTINGS_REBUILD_SQL)
+
+    # Older databases stored attachments inline in email_queue
+    if 'pdf_data' in _existing_cols(cursor, 'email_queue'):
+        migrations.append(EMAIL_QUEUE_PDF_MOVE_SQL)
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            migrations.append("ALTER TABLE email_queue DROP COLUMN pdf_data;")
+
+    # Apply the whole schema in a single transaction
+    cursor.executescript("\n".join([
+        "BEGIN;", SCHEMA_SQL, *migrations, INVOICE_ITEM_LINE_NO_SQL, INDEX_SQL, FTS_SQL, COUNTER_SQL,
+        DEFAULT_CATEGORIES_SQL,
+        "INSERT OR REPLACE INTO app_settings (key, value) "
+        f"VALUES ('schema_version', '{CURRENT_SCHEMA_VERSION}');",
+        "COMMIT;"
+    ]))
+
+    # Refresh planner statistics so the indexes above get picked
+    cursor.execute("ANALYZE")
     conn.close()
 
     print(f"Database initialized at: {DB_PATH}")
@@ -1,11 +1,319 @@
 """Data models and CRUD operations"""
-from dataclasses import dataclass, field
-from typing import Optional, List
+import functools
+import operator
+import sqlite3
+import sys
+from collections import defaultdict
+from contextlib import closing
+from dataclasses import MISSING, dataclass, field, fields
+from typing import ClassVar, Dict, Iterator, Optional, List
 from datetime import date, datetime, timedelta
-from .db import get_connection
+from .db import get_connection, pool, read_blob
+from .writer import writer
+
+# Slotted models (Python 3.10+) drop the per-instance __dict__, which makes
+# building thousands of rows for lists and reports cheaper
+_MODEL_OPTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# orjson is an optional, faster JSON codec for held bill items
+try:
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+
+# Column lists in dataclass field order, so rows construct positionally
+COMPANY_COLS = ("id", "name", "address", "gstin", "state_code", "phone", "email",
+                "bank_details", "logo_path")
+PRODUCT_COLS = ("id", "name", "barcode", "hsn_code", "unit", "price", "gst_rate", "stock_qty",
+                "low_stock_alert", "is_active", "created_at", "category_id", "purchase_price")
+CUSTOMER_COLS = ("id", "name", "phone", "address", "gstin", "state_code", "is_active",
+                 "credit_balance", "credit_limit", "pin_code")
+INVOICE_ITEM_COLS = ("id", "invoice_id", "product_id", "product_name", "hsn_code", "qty", "unit",
+                     "rate", "gst_rate", "taxable_value", "cgst", "sgst", "igst", "total",
+                     "line_no")
+INVOICE_COLS = ("id", "invoice_number", "invoice_date", "customer_id", "customer_name", "subtotal",
+                "cgst_total", "sgst_total", "igst_total", "discount", "grand_total", "payment_mode",
+                "is_cancelled", "created_at", "vehicle_number", "transport_mode",
+                "transport_distance", "transporter_id", "eway_bill_number", "amount_paid",
+                "balance_due", "payment_status")
+
+CATEGORY_COLS = ("id", "name", "description", "is_active")
+STOCK_LOG_COLS = ("id", "product_id", "change_qty", "reason", "reference_id", "created_at")
+HELD_BILL_COLS = ("id", "hold_name", "customer_id", "customer_name", "items_json", "discount",
+                  "created_at")
+INVOICE_PAYMENT_COLS = ("id", "invoice_id", "payment_mode", "amount", "payment_date",
+                        "reference_number", "notes", "created_at")
+CREDIT_NOTE_ITEM_COLS = ("id", "credit_note_id", "product_id", "product_name", "hsn_code", "qty",
+                         "unit", "rate", "gst_rate", "taxable_value", "cgst", "sgst", "igst", "total")
+CREDIT_NOTE_COLS = ("id", "credit_note_number", "credit_note_date", "original_invoice_id",
+                    "original_invoice_number", "customer_id", "customer_name", "reason",
+                    "reason_details", "subtotal", "cgst_total", "sgst_total", "igst_total",
+                    "grand_total", "status", "created_at")
+QUOTATION_ITEM_COLS = ("id", "quotation_id", "product_id", "product_name", "hsn_code", "qty",
+                       "unit", "rate", "gst_rate", "taxable_value", "cgst", "sgst", "igst", "total")
+QUOTATION_COLS = ("id", "quotation_number", "quotation_date", "validity_date", "customer_id",
+                  "customer_name", "subtotal", "cgst_total", "sgst_total", "igst_total", "discount",
+                  "grand_total", "status", "notes", "terms_conditions", "converted_invoice_id",
+                  "created_at")
+EMAIL_QUEUE_COLS = ("id", "invoice_id", "recipient_email", "subject", "body", "status",
+                    "retry_count", "error_message", "created_at", "sent_at")
+
+SELECT_COMPANY = f"SELECT {', '.join(COMPANY_COLS)} FROM company"
+SELECT_PRODUCTS = f"SELECT {', '.join(PRODUCT_COLS)} FROM products"
+SELECT_CUSTOMERS = f"SELECT {', '.join(CUSTOMER_COLS)} FROM customers"
+SELECT_INVOICE_ITEMS = f"SELECT {', '.join(INVOICE_ITEM_COLS)} FROM invoice_items"
+SELECT_INVOICES = f"SELECT {', '.join(INVOICE_COLS)} FROM invoices"
+SELECT_CATEGORIES = f"SELECT {', '.join(CATEGORY_COLS)} FROM categories"
+SELECT_STOCK_LOG = f"SELECT {', '.join(STOCK_LOG_COLS)} FROM stock_log"
+SELECT_HELD_BILLS = f"SELECT {', '.join(HELD_BILL_COLS)} FROM held_bills"
+SELECT_INVOICE_PAYMENTS = f"SELECT {', '.join(INVOICE_PAYMENT_COLS)} FROM invoice_payments"
+SELECT_CREDIT_NOTE_ITEMS = f"SELECT {', '.join(CREDIT_NOTE_ITEM_COLS)} FROM credit_note_items"
+SELECT_CREDIT_NOTES = f"SELECT {', '.join(CREDIT_NOTE_COLS)} FROM credit_notes"
+SELECT_QUOTATION_ITEMS = f"SELECT {', '.join(QUOTATION_ITEM_COLS)} FROM quotation_items"
+SELECT_QUOTATIONS = f"SELECT {', '.join(QUOTATION_COLS)} FROM quotations"
+SELECT_EMAIL_QUEUE = f"SELECT {', '.join(EMAIL_QUEUE_COLS)} FROM email_queue"
+SELECT_PRODUCTS_FTS = (
+    f"SELECT {', '.join('p.' + c for c in PRODUCT_COLS)} FROM products p"
+    " JOIN products_fts f ON p.id = f.rowid"
+)
+SELECT_CUSTOMERS_FTS = (
+    f"SELECT {', '.join('c.' + col for col in CUSTOMER_COLS)} FROM customers c"
+    " JOIN customers_fts f ON c.id = f.rowid"
+)
+SELECT_INVOICES_WITH_ITEMS = (
+    "SELECT " + ", ".join([f"i.{c}" for c in INVOICE_COLS] + [f"ii.{c}" for c in INVOICE_ITEM_COLS])
+    + " FROM invoices i LEFT JOIN invoice_items ii ON ii.invoice_id = i.id"
+)
+
+# Hot-path statements, built once so every call reuses the same SQL text
+# and hits the connection's prepared-statement cache
+PRODUCT_BY_ID_SQL = SELECT_PRODUCTS + " WHERE id = ?"
+PRODUCT_BY_BARCODE_SQL = SELECT_PRODUCTS + " WHERE barcode = ? AND is_active = 1"
+CUSTOMER_BY_ID_SQL = SELECT_CUSTOMERS + " WHERE id = ?"
+CATEGORY_BY_ID_SQL = SELECT_CATEGORIES + " WHERE id = ?"
+INVOICE_BY_ID_SQL = SELECT_INVOICES + " WHERE id = ?"
+INVOICE_ITEMS_BY_INVOICE_SQL = SELECT_INVOICE_ITEMS + " WHERE invoice_id = ? ORDER BY line_no"
+INVOICE_ID_BY_NUMBER_SQL = "SELECT id FROM invoices WHERE invoice_number = ?"
+LAST_NUMBER_SQL = "SELECT last_num FROM invoice_counters WHERE prefix = ?"
+INVOICES_IN_RANGE_SQL = SELECT_INVOICES_WITH_ITEMS + """
+    WHERE i.invoice_date BETWEEN ? AND ?
+    ORDER BY i.invoice_date DESC, i.id DESC, ii.line_no
+"""
+ACTIVE_INVOICES_IN_RANGE_SQL = SELECT_INVOICES_WITH_ITEMS + """
+    WHERE i.invoice_date BETWEEN ? AND ? AND i.is_cancelled = 0
+    ORDER BY i.invoice_date DESC, i.id DESC, ii.line_no
+"""
+INSERT_INVOICE_ITEMS_SQL = """
+    INSERT INTO invoice_items (invoice_id, line_no, product_id, product_name, hsn_code,
+    qty, unit, rate, gst_rate, taxable_value, cgst, sgst, igst, total)
+    VALUES """
+INVOICE_ITEM_VALUES = "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+# Lines whose values did not change match the WHERE as false and are not rewritten
+UPSERT_INVOICE_ITEMS_SQL = """
+    ON CONFLICT(invoice_id, line_no) DO UPDATE SET
+    product_id=excluded.product_id, product_name=excluded.product_name,
+    hsn_code=excluded.hsn_code, qty=excluded.qty, unit=excluded.unit, rate=excluded.rate,
+    gst_rate=excluded.gst_rate, taxable_value=excluded.taxable_value, cgst=excluded.cgst,
+    sgst=excluded.sgst, igst=excluded.igst, total=excluded.total
+    WHERE (product_id, product_name, hsn_code, qty, unit, rate, gst_rate, taxable_value,
+           cgst, sgst, igst, total)
+       IS NOT (excluded.product_id, excluded.product_name, excluded.hsn_code, excluded.qty,
+               excluded.unit, excluded.rate, excluded.gst_rate, excluded.taxable_value,
+               excluded.cgst, excluded.sgst, excluded.igst, excluded.total)
+"""
+DELETE_TRAILING_INVOICE_ITEMS_SQL = "DELETE FROM invoice_items WHERE invoice_id = ? AND line_no > ?"
+# Quotation items are matched to the saved rows by position, in id order
+QUOTATION_ITEM_VALUE_COLS = QUOTATION_ITEM_COLS[2:]
+QUOTATION_ITEMS_BY_QUOTATION_SQL = SELECT_QUOTATION_ITEMS + " WHERE quotation_id = ? ORDER BY id"
+UPDATE_QUOTATION_ITEM_SQL = (
+    f"UPDATE quotation_items SET {', '.join(col + '=?' for col in QUOTATION_ITEM_VALUE_COLS)} WHERE id=?"
+)
+
+# Invoice items per multi-row INSERT; 70 rows x 14 columns stays under the
+# 999 bound parameter limit of older SQLite builds
+INVOICE_ITEM_CHUNK = 70
+
+UPDATE_PRODUCT_STOCK_SQL = "UPDATE products SET stock_qty = stock_qty + ? WHERE id = ? RETURNING stock_qty"
+UPDATE_CUSTOMER_CREDIT_SQL = (
+    "UPDATE customers SET credit_balance = credit_balance + ? WHERE id = ? RETURNING credit_balance"
+)
+LOG_STOCK_CHANGE_SQL = """
+    INSERT INTO stock_log (product_id, change_qty, reason, reference_id)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Rows pulled per fetchmany() call by the streaming iter_* readers
+FETCH_BATCH = 256
+
+# Products per batched stock UPDATE; each needs three bound parameters
+STOCK_UPDATE_CHUNK = 300
+
+# Logs a stock change only for products that exist, like update_stock()
+INSERT_STOCK_LOG_SQL = """
+    INSERT INTO stock_log (product_id, change_qty, reason, reference_id)
+    SELECT id, ?, ?, ? FROM products WHERE id = ?
+"""
+
+UPDATE_INVOICE_SQL = """
+    UPDATE invoices SET invoice_number=?, invoice_date=?, customer_id=?,
+    customer_name=?, subtotal=?, cgst_total=?, sgst_total=?, igst_total=?,
+    discount=?, grand_total=?, payment_mode=?, is_cancelled=?,
+    amount_paid=?, balance_due=?, payment_status=?,
+    vehicle_number=?, transport_mode=?, transport_distance=?,
+    transporter_id=?, eway_bill_number=?
+    WHERE id=?
+"""
+INSERT_INVOICE_SQL = """
+    INSERT INTO invoices (invoice_number, invoice_date, customer_id, customer_name,
+    subtotal, cgst_total, sgst_total, igst_total, discount, grand_total, payment_mode,
+    is_cancelled, amount_paid, balance_due, payment_status,
+    vehicle_number, transport_mode, transport_distance, transporter_id, eway_bill_number)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    RETURNING id
+"""
+
+UPDATE_CREDIT_NOTE_SQL = """
+    UPDATE credit_notes SET credit_note_number=?, credit_note_date=?,
+    original_invoice_id=?, original_invoice_number=?, customer_id=?,
+    customer_name=?, reason=?, reason_details=?, subtotal=?, cgst_total=?,
+    sgst_total=?, igst_total=?, grand_total=?, status=?
+    WHERE id=?
+"""
+INSERT_CREDIT_NOTE_SQL = """
+    INSERT INTO credit_notes (credit_note_number, credit_note_date,
+    original_invoice_id, original_invoice_number, customer_id, customer_name,
+    reason, reason_details, subtotal, cgst_total, sgst_total, igst_total,
+    grand_total, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Bound parameter limit of older SQLite builds, which caps rows per multi-row INSERT
+MAX_BOUND_PARAMS = 999
+
+
+@functools.lru_cache(maxsize=None)
+def _bulk_stock_update_sql(rows: int) -> str:
+    """UPDATE adding a per-product quantity through CASE id WHEN ... END"""
+    return ("UPDATE products SET stock_qty = stock_qty + CASE id "
+            + " ".join(["WHEN ? THEN ?"] * rows)
+            + " END WHERE id IN (" + ", ".join(["?"] * rows) + ")")
+
+
+@functools.lru_cache(maxsize=None)
+def _insert_rows_sql(table: str, cols: tuple, rows: int) -> str:
+    """INSERT into table with one VALUES group per row"""
+    group = f"({', '.join('?' * len(cols))})"
+    return f"INSERT INTO {table} ({', '.join(cols)}) VALUES " + ", ".join([group] * rows)
+
+
+def _insert_rows(cursor: sqlite3.Cursor, table: str, cols: tuple, objs: list):
+    """Insert the cols values of objs using as few multi-row INSERTs as the parameter limit allows"""
+    getter = _values_getter(cols)
+    chunk_rows = MAX_BOUND_PARAMS // len(cols)
+    for start in range(0, len(objs), chunk_rows):
+        chunk = objs[start:start + chunk_rows]
+        cursor.execute(_insert_rows_sql(table, cols, len(chunk)),
+                       [value for obj in chunk for value in getter(obj)])
+
+
+@functools.lru_cache(maxsize=None)
+def _values_getter(cols: tuple):
+    return operator.attrgetter(*cols)
+
+
+def _column_values(obj, cols: tuple) -> tuple:
+    """Snapshot of a model's column values, used to skip no-op saves"""
+    return _values_getter(cols)(obj)
+
+
+@functools.lru_cache(maxsize=None)
+def _update_columns_sql(table: str, cols: tuple) -> str:
+    """UPDATE setting only cols on the row with a given id"""
+    return f"UPDATE {table} SET {', '.join(col + '=?' for col in cols)} WHERE id=?"
+
+
+def _mark_column_saved(obj, cols: tuple, col: str):
+    """Update one column in the saved snapshot, leaving other unsaved edits dirty"""
+    if obj._saved is not None:
+        i = cols.index(col)
+        obj._saved = obj._saved[:i] + (getattr(obj, col),) + obj._saved[i + 1:]
+
+
+def _tuple_cursor(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """Cursor returning plain tuples, for bulk reads built positionally"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+
+def _model_cursor(conn: sqlite3.Connection, factory) -> sqlite3.Cursor:
+    """Cursor whose rows come back already built by a model row factory"""
+    cursor = conn.cursor()
+    cursor.row_factory = factory
+    return cursor
+
+
+def _add_make(cls, cols: tuple):
+    """Attach cls._make(row) and cls._row_factory(cursor, row) for rows in cols order
+
+    Like namedtuple._make, but for the models: the generated code skips
+    __init__, fills the slots straight from the row and sets the remaining
+    fields to their defaults. A loaded row is also the model's _saved snapshot.
+    """
+    namespace = {'_new': object.__new__, '_cls': cls}
+    lines = ["def _row_factory(cursor, r):",
+             "    self = _new(_cls)",
+             f"    ({', '.join('self.' + col for col in cols)},) = r"]
+    for f in fields(cls):
+        if f.name in cols:
+            continue
+        if f.name == '_saved':
+            lines.append("    self._saved = tuple(r)")
+        elif f.default_factory is not MISSING:
+            namespace[f'_factory_{f.name}'] = f.default_factory
+            lines.append(f"    self.{f.name} = _factory_{f.name}()")
+        else:
+            namespace[f'_default_{f.name}'] = f.default
+            lines.append(f"    self.{f.name} = _default_{f.name}")
+    lines.append("    return self")
+    body = "\n".join(lines)
+    exec(body, namespace)
+    exec(body.replace("def _row_factory(cursor, r):", "def _make(r):", 1), namespace)
+    cls._row_factory = staticmethod(namespace['_row_factory'])
+    cls._make = staticmethod(namespace['_make'])
+
+
+def _stream_rows(cursor: sqlite3.Cursor) -> Iterator:
+    """Yield a cursor's rows, fetching them FETCH_BATCH at a time"""
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH)
+        if not rows:
+            return
+        yield from rows
+
+
+def _next_number(prefix: str) -> str:
+    """Next document number after the highest one saved under prefix"""
+    row = get_connection().execute(LAST_NUMBER_SQL, (prefix,)).fetchone()
+    return f"{prefix}{(row[0] if row else 0) + 1:04d}"
 
 
-@dataclass
+@functools.lru_cache(maxsize=None)
+def _upsert_invoice_items_sql(rows: int) -> str:
+    """Upsert into invoice_items with one VALUES group per row"""
+    return INSERT_INVOICE_ITEMS_SQL + ", ".join([INVOICE_ITEM_VALUES] * rows) + UPSERT_INVOICE_ITEMS_SQL
+
+
+@dataclass(**_MODEL_OPTS)
 class Company:
     id: Optional[int] = None
     name: str = ""
@@ -16,38 +324,90 @@ class Company:
     email: str = ""
     bank_details: str = ""
     logo_path: str = ""
+    _saved: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    # Process-wide copy of the single company row, refreshed on save()
+    _cached: ClassVar[Optional['Company']] = None
+
+    def __post_init__(self):
+        # Loaded rows start clean so an unchanged save() is skipped
+        self._saved = _column_values(self, COMPANY_COLS) if self.id else None
 
     @classmethod
     def get(cls) -> Optional['Company']:
         """Get company details (singleton)"""
+        if cls._cached is not None:
+            return cls._cached
         conn = get_connection()
-        row = conn.execute("SELECT * FROM company LIMIT 1").fetchone()
-        conn.close()
+        row = conn.execute(SELECT_COMPANY + " LIMIT 1").fetchone()
         if row:
-            return cls(**dict(row))
-        return None
+            cls._cached = cls._make(row)
+        return cls._cached
 
     def save(self):
         """Save or update company details"""
-        conn = get_connection()
-        if self.id:
-            conn.execute("""
-                UPDATE company SET name=?, address=?, gstin=?, state_code=?,
-                phone=?, email=?, bank_details=?, logo_path=? WHERE id=?
-            """, (self.name, self.address, self.gstin, self.state_code,
-                  self.phone, self.email, self.bank_details, self.logo_path, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO company (name, address, gstin, state_code, phone, email, bank_details, logo_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.name, self.address, self.gstin, self.state_code,
-                  self.phone, self.email, self.bank_details, self.logo_path))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-
-@dataclass
+        if self.id and self._saved == _column_values(self, COMPANY_COLS):
+            return
+        def write(cursor):
+            if self.id:
+                cursor.execute("""
+                    UPDATE company SET name=?, address=?, gstin=?, state_code=?,
+                    phone=?, email=?, bank_details=?, logo_path=? WHERE id=?
+                """, (self.name, self.address, self.gstin, self.state_code,
+                      self.phone, self.email, self.bank_details, self.logo_path, self.id))
+            else:
+                cursor.execute("""
+                    INSERT INTO company (name, address, gstin, state_code, phone, email, bank_details, logo_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (self.name, self.address, self.gstin, self.state_code,
+                      self.phone, self.email, self.bank_details, self.logo_path))
+                self.id = cursor.lastrowid
+        writer.run(write)
+        self._saved = _column_values(self, COMPANY_COLS)
+        Company._cached = self
+
+
+def _fts_prefix_query(query: str) -> str:
+    """Turn search box text into an FTS5 query matching every word as a prefix"""
+    return " ".join('"' + token.replace('"', '""') + '"*' for token in query.split())
+
+
+@functools.lru_cache(maxsize=2048)
+def _product_row_by_id(product_id: int):
+    """Cached product row lookup by ID"""
+    conn = get_connection()
+    return _tuple_cursor(conn).execute(PRODUCT_BY_ID_SQL, (product_id,)).fetchone()
+
+
+@functools.lru_cache(maxsize=2048)
+def _product_row_by_barcode(barcode: str):
+    """Cached active product row lookup by barcode"""
+    conn = get_connection()
+    return _tuple_cursor(conn).execute(PRODUCT_BY_BARCODE_SQL, (barcode,)).fetchone()
+
+
+def clear_product_cache():
+    """Drop cached product rows after a product write"""
+    _product_row_by_id.cache_clear()
+    _product_row_by_barcode.cache_clear()
+
+
+@functools.lru_cache(maxsize=256)
+def _category_row_by_id(category_id: int):
+    """Cached category row lookup by ID"""
+    conn = get_connection()
+    return conn.execute(CATEGORY_BY_ID_SQL, (category_id,)).fetchone()
+
+
+def clear_caches():
+    """Drop every in-memory model cache, e.g. after the database file is replaced"""
+    Company._cached = None
+    AppSettings._cache = None
+    clear_product_cache()
+    _category_row_by_id.cache_clear()
+
+
+@dataclass(**_MODEL_OPTS)
 class Product:
     id: Optional[int] = None
     name: str = ""
@@ -62,99 +422,139 @@ class Product:
     created_at: Optional[datetime] = None
     category_id: Optional[int] = None
     purchase_price: float = 0.0
+    _saved: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Loaded rows start clean so an unchanged save() is skipped
+        self._saved = _column_values(self, PRODUCT_COLS) if self.id else None
 
     @classmethod
     def get_all(cls, active_only: bool = True) -> List['Product']:
         """Get all products"""
-        conn = get_connection()
-        query = "SELECT * FROM products"
+        return list(cls.iter_all(active_only))
+
+    @classmethod
+    def iter_all(cls, active_only: bool = True) -> Iterator['Product']:
+        """Yield all products without building the whole list"""
+        query = SELECT_PRODUCTS
         if active_only:
             query += " WHERE is_active = 1"
         query += " ORDER BY name"
-        rows = conn.execute(query).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        with pool.acquire_read() as conn, closing(_model_cursor(conn, Product._row_factory)) as cursor:
+            yield from _stream_rows(cursor.execute(query))
 
     @classmethod
-    def get_by_id(cls, product_id: int) -> Optional['Product']:
+    def get_by_id(cls, product_id: int, cache: bool = True) -> Optional['Product']:
         """Get product by ID"""
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM products WHERE id = ?", (product_id,)).fetchone()
-        conn.close()
+        if cache:
+            row = _product_row_by_id(product_id)
+        else:
+            row = _product_row_by_id.__wrapped__(product_id)
         if row:
-            return cls(**dict(row))
+            return Product._make(row)
         return None
 
     @classmethod
-    def get_by_barcode(cls, barcode: str) -> Optional['Product']:
+    def get_by_barcode(cls, barcode: str, cache: bool = True) -> Optional['Product']:
         """Get product by barcode"""
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM products WHERE barcode = ? AND is_active = 1", (barcode,)).fetchone()
-        conn.close()
+        if cache:
+            row = _product_row_by_barcode(barcode)
+        else:
+            row = _product_row_by_barcode.__wrapped__(barcode)
         if row:
-            return cls(**dict(row))
+            return Product._make(row)
         return None
 
     @classmethod
     def search(cls, query: str) -> List['Product']:
         """Search products by name or barcode"""
+        match = _fts_prefix_query(query)
+        with pool.acquire_read() as conn:
+            cursor = _model_cursor(conn, Product._row_factory)
+            if not match:
+                return cursor.execute(
+                    SELECT_PRODUCTS + " WHERE is_active = 1 ORDER BY name LIMIT 20").fetchall()
+            return cursor.execute(SELECT_PRODUCTS_FTS + """
+                WHERE products_fts MATCH ? AND p.is_active = 1
+                ORDER BY p.name LIMIT 20
+            """, (match,)).fetchall()
+
+    @classmethod
+    def get_low_stock(cls, limit: Optional[int] = None) -> List['Product']:
+        """Get products with low stock, most short first"""
         conn = get_connection()
-        search_term = f"%{query}%"
-        rows = conn.execute("""
-            SELECT * FROM products
-            WHERE (name LIKE ? OR barcode LIKE ?) AND is_active = 1
-            ORDER BY name LIMIT 20
-        """, (search_term, search_term)).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        return _model_cursor(conn, Product._row_factory).execute(SELECT_PRODUCTS + """
+            WHERE stock_deficit <= 0 AND is_active = 1
+            ORDER BY stock_deficit LIMIT ?
+        """, (-1 if limit is None else limit,)).fetchall()
 
     @classmethod
-    def get_low_stock(cls) -> List['Product']:
-        """Get products with low stock"""
+    def count_low_stock(cls) -> int:
+        """Count products with low stock"""
         conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM products
-            WHERE stock_qty <= low_stock_alert AND is_active = 1
-            ORDER BY stock_qty
-        """).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        return conn.execute(
+            "SELECT COUNT(*) FROM products WHERE stock_deficit <= 0 AND is_active = 1").fetchone()[0]
 
     def save(self):
         """Save or update product"""
-        conn = get_connection()
-        if self.id:
-            conn.execute("""
-                UPDATE products SET name=?, barcode=?, hsn_code=?, unit=?, price=?,
-                gst_rate=?, stock_qty=?, low_stock_alert=?, is_active=?, category_id=?, purchase_price=? WHERE id=?
-            """, (self.name, self.barcode, self.hsn_code, self.unit, self.price,
-                  self.gst_rate, self.stock_qty, self.low_stock_alert, self.is_active,
-                  self.category_id, self.purchase_price, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO products (name, barcode, hsn_code, unit, price, gst_rate, stock_qty, low_stock_alert, is_active, category_id, purchase_price)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.name, self.barcode, self.hsn_code, self.unit, self.price,
-                  self.gst_rate, self.stock_qty, self.low_stock_alert, self.is_active,
-                  self.category_id, self.purchase_price))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        if self.id and self._saved == _column_values(self, PRODUCT_COLS):
+            return
+        def write(cursor):
+            if self.id:
+                cursor.execute("""
+                    UPDATE products SET name=?, barcode=?, hsn_code=?, unit=?, price=?,
+                    gst_rate=?, stock_qty=?, low_stock_alert=?, is_active=?, category_id=?, purchase_price=? WHERE id=?
+                """, (self.name, self.barcode, self.hsn_code, self.unit, self.price,
+                      self.gst_rate, self.stock_qty, self.low_stock_alert, self.is_active,
+                      self.category_id, self.purchase_price, self.id))
+            else:
+                cursor.execute("""
+                    INSERT INTO products (name, barcode, hsn_code, unit, price, gst_rate, stock_qty, low_stock_alert, is_active, category_id, purchase_price)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (self.name, self.barcode, self.hsn_code, self.unit, self.price,
+                      self.gst_rate, self.stock_qty, self.low_stock_alert, self.is_active,
+                      self.category_id, self.purchase_price))
+                self.id = cursor.lastrowid
+        writer.run(write)
+        self._saved = _column_values(self, PRODUCT_COLS)
+        clear_product_cache()
 
     def update_stock(self, qty_change: float, reason: str, reference_id: int = None):
         """Update stock quantity and log the change"""
-        conn = get_connection()
-        self.stock_qty += qty_change
-        conn.execute("UPDATE products SET stock_qty = ? WHERE id = ?", (self.stock_qty, self.id))
-        conn.execute("""
-            INSERT INTO stock_log (product_id, change_qty, reason, reference_id)
-            VALUES (?, ?, ?, ?)
-        """, (self.id, qty_change, reason, reference_id))
-        conn.commit()
-        conn.close()
-
+        def write(cursor):
+            row = cursor.execute(UPDATE_PRODUCT_STOCK_SQL, (qty_change, self.id)).fetchone()
+            cursor.execute(LOG_STOCK_CHANGE_SQL, (self.id, qty_change, reason, reference_id))
+            return row
+        row = writer.run(write)
+        if row:
+            self.stock_qty = row['stock_qty']
+            _mark_column_saved(self, PRODUCT_COLS, 'stock_qty')
+        clear_product_cache()
 
-@dataclass
+    @classmethod
+    def bulk_update_stock(cls, changes: List[tuple]):
+        """Apply (product_id, qty_change, reason, reference_id) changes in one transaction"""
+        totals = {}
+        for product_id, qty_change, _, _ in changes:
+            totals[product_id] = totals.get(product_id, 0) + qty_change
+        if not totals:
+            return
+
+        product_ids = list(totals)
+        def write(cursor):
+            for start in range(0, len(product_ids), STOCK_UPDATE_CHUNK):
+                chunk = product_ids[start:start + STOCK_UPDATE_CHUNK]
+                params = [value for product_id in chunk for value in (product_id, totals[product_id])]
+                cursor.execute(_bulk_stock_update_sql(len(chunk)), params + chunk)
+            cursor.executemany(INSERT_STOCK_LOG_SQL, [
+                (qty_change, reason, reference_id, product_id)
+                for product_id, qty_change, reason, reference_id in changes
+            ])
+        writer.run(write)
+        clear_product_cache()
+
+
+@dataclass(**_MODEL_OPTS)
 class Customer:
     id: Optional[int] = None
     name: str = ""
@@ -166,71 +566,77 @@ class Customer:
     credit_balance: float = 0.0
     credit_limit: float = 0.0
     pin_code: str = ""
+    _saved: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Loaded rows start clean so an unchanged save() is skipped
+        self._saved = _column_values(self, CUSTOMER_COLS) if self.id else None
 
     @classmethod
     def get_all(cls, active_only: bool = True) -> List['Customer']:
         """Get all customers"""
         conn = get_connection()
-        query = "SELECT * FROM customers"
+        query = SELECT_CUSTOMERS
         if active_only:
             query += " WHERE is_active = 1"
         query += " ORDER BY name"
-        rows = conn.execute(query).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        rows = _tuple_cursor(conn).execute(query).fetchall()
+        return [cls._make(row) for row in rows]
 
     @classmethod
     def get_by_id(cls, customer_id: int) -> Optional['Customer']:
         """Get customer by ID"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM customers WHERE id = ?", (customer_id,)).fetchone()
-        conn.close()
+        row = conn.execute(CUSTOMER_BY_ID_SQL, (customer_id,)).fetchone()
         if row:
-            return cls(**dict(row))
+            return cls._make(row)
         return None
 
     @classmethod
     def search(cls, query: str) -> List['Customer']:
         """Search customers by name or phone"""
-        conn = get_connection()
-        search_term = f"%{query}%"
-        rows = conn.execute("""
-            SELECT * FROM customers
-            WHERE (name LIKE ? OR phone LIKE ?) AND is_active = 1
-            ORDER BY name LIMIT 20
-        """, (search_term, search_term)).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        match = _fts_prefix_query(query)
+        with pool.acquire_read() as conn:
+            if not match:
+                rows = _tuple_cursor(conn).execute(
+                    SELECT_CUSTOMERS + " WHERE is_active = 1 ORDER BY name LIMIT 20").fetchall()
+            else:
+                rows = _tuple_cursor(conn).execute(SELECT_CUSTOMERS_FTS + """
+                    WHERE customers_fts MATCH ? AND c.is_active = 1
+                    ORDER BY c.name LIMIT 20
+                """, (match,)).fetchall()
+        return [cls._make(row) for row in rows]
 
     def save(self):
         """Save or update customer"""
-        conn = get_connection()
-        if self.id:
-            conn.execute("""
-                UPDATE customers SET name=?, phone=?, address=?, gstin=?, state_code=?, is_active=?,
-                credit_balance=?, credit_limit=?, pin_code=? WHERE id=?
-            """, (self.name, self.phone, self.address, self.gstin, self.state_code, self.is_active,
-                  self.credit_balance, self.credit_limit, self.pin_code, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO customers (name, phone, address, gstin, state_code, is_active, credit_balance, credit_limit, pin_code)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.name, self.phone, self.address, self.gstin, self.state_code, self.is_active,
-                  self.credit_balance, self.credit_limit, self.pin_code))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        if self.id and self._saved == _column_values(self, CUSTOMER_COLS):
+            return
+        def write(cursor):
+            if self.id:
+                cursor.execute("""
+                    UPDATE customers SET name=?, phone=?, address=?, gstin=?, state_code=?, is_active=?,
+                    credit_balance=?, credit_limit=?, pin_code=? WHERE id=?
+                """, (self.name, self.phone, self.address, self.gstin, self.state_code, self.is_active,
+                      self.credit_balance, self.credit_limit, self.pin_code, self.id))
+            else:
+                cursor.execute("""
+                    INSERT INTO customers (name, phone, address, gstin, state_code, is_active, credit_balance, credit_limit, pin_code)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (self.name, self.phone, self.address, self.gstin, self.state_code, self.is_active,
+                      self.credit_balance, self.credit_limit, self.pin_code))
+                self.id = cursor.lastrowid
+        writer.run(write)
+        self._saved = _column_values(self, CUSTOMER_COLS)
 
     def update_credit(self, amount: float):
         """Update customer credit balance (positive = add credit, negative = reduce)"""
-        conn = get_connection()
-        self.credit_balance += amount
-        conn.execute("UPDATE customers SET credit_balance = ? WHERE id = ?", (self.credit_balance, self.id))
-        conn.commit()
-        conn.close()
+        rows = writer.execute(UPDATE_CUSTOMER_CREDIT_SQL, (amount, self.id))
+        if rows:
+            self.credit_balance = rows[0][0]
+            _mark_column_saved(self, CUSTOMER_COLS, 'credit_balance')
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class InvoiceItem:
     id: Optional[int] = None
     invoice_id: Optional[int] = None
@@ -246,9 +652,10 @@ class InvoiceItem:
     sgst: float = 0.0
     igst: float = 0.0
     total: float = 0.0
+    line_no: Optional[int] = None
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class Invoice:
     id: Optional[int] = None
     invoice_number: str = ""
@@ -264,7 +671,6 @@ class Invoice:
     payment_mode: str = "CASH"
     is_cancelled: bool = False
     created_at: Optional[datetime] = None
-    items: List[InvoiceItem] = field(default_factory=list)
     # e-Way Bill fields
     vehicle_number: str = ""
     transport_mode: str = "Road"
@@ -275,31 +681,29 @@ class Invoice:
     amount_paid: float = 0.0
     balance_due: float = 0.0
     payment_status: str = "PAID"  # UNPAID, PARTIAL, PAID
+    items: List[InvoiceItem] = field(default_factory=list)
 
     @classmethod
     def get_by_id(cls, invoice_id: int) -> Optional['Invoice']:
         """Get invoice by ID with items"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM invoices WHERE id = ?", (invoice_id,)).fetchone()
+        row = conn.execute(INVOICE_BY_ID_SQL, (invoice_id,)).fetchone()
         if not row:
-            conn.close()
             return None
 
-        invoice = cls(**{k: v for k, v in dict(row).items() if k != 'items'})
+        invoice = cls._make(row)
 
         # Get items
-        items = conn.execute("SELECT * FROM invoice_items WHERE invoice_id = ?", (invoice_id,)).fetchall()
-        invoice.items = [InvoiceItem(**dict(item)) for item in items]
+        invoice.items = _model_cursor(conn, InvoiceItem._row_factory).execute(
+            INVOICE_ITEMS_BY_INVOICE_SQL, (invoice_id,)).fetchall()
 
-        conn.close()
         return invoice
 
     @classmethod
     def get_by_number(cls, invoice_number: str) -> Optional['Invoice']:
         """Get invoice by number"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM invoices WHERE invoice_number = ?", (invoice_number,)).fetchone()
-        conn.close()
+        row = conn.execute(INVOICE_ID_BY_NUMBER_SQL, (invoice_number,)).fetchone()
         if row:
             return cls.get_by_id(row['id'])
         return None
@@ -307,21 +711,75 @@ class Invoice:
     @classmethod
     def get_by_date_range(cls, start_date: date, end_date: date, include_cancelled: bool = True) -> List['Invoice']:
         """Get invoices in date range"""
-        conn = get_connection()
-        if include_cancelled:
-            rows = conn.execute("""
-                SELECT * FROM invoices
-                WHERE invoice_date BETWEEN ? AND ?
-                ORDER BY invoice_date DESC, id DESC
-            """, (start_date.isoformat(), end_date.isoformat())).fetchall()
-        else:
-            rows = conn.execute("""
-                SELECT * FROM invoices
+        return list(cls.iter_by_date_range(start_date, end_date, include_cancelled))
+
+    @classmethod
+    def iter_by_date_range(cls, start_date: date, end_date: date,
+                           include_cancelled: bool = True) -> Iterator['Invoice']:
+        """Yield invoices in date range, each with its items, one at a time"""
+        sql = INVOICES_IN_RANGE_SQL if include_cancelled else ACTIVE_INVOICES_IN_RANGE_SQL
+        params = (start_date, end_date)
+
+        # Item columns follow the invoice columns in each joined row
+        split = len(INVOICE_COLS)
+        invoice = None
+        with pool.acquire_read() as conn, closing(_tuple_cursor(conn).execute(sql, params)) as cursor:
+            for row in _stream_rows(cursor):
+                if invoice is None or invoice.id != row[0]:
+                    if invoice is not None:
+                        yield invoice
+                    invoice = cls._make(row[:split])
+                if row[split] is not None:
+                    invoice.items.append(InvoiceItem._make(row[split:]))
+        if invoice is not None:
+            yield invoice
+
+    @classmethod
+    def sum_by_date_range(cls, start_date: date, end_date: date,
+                          group_by: Optional[str] = None) -> List[tuple]:
+        """Totals of non-cancelled invoices as (group, count, sales, tax) rows
+
+        group_by may be 'invoice_date' or 'payment_mode'; without it a single
+        row with a None group covers the whole range.
+        """
+        if group_by not in (None, "invoice_date", "payment_mode"):
+            raise ValueError(f"Cannot group invoices by {group_by!r}")
+        key = group_by or "NULL"
+        sql = f"""
+            SELECT {key}, COUNT(*), COALESCE(SUM(grand_total), 0),
+                   COALESCE(SUM(cgst_total + sgst_total + igst_total), 0)
+            FROM invoices
+            WHERE invoice_date BETWEEN ? AND ? AND is_cancelled = 0
+        """
+        if group_by:
+            sql += f" GROUP BY {key}"
+        with pool.acquire_read() as conn:
+            return _tuple_cursor(conn).execute(
+                sql, (start_date, end_date)).fetchall()
+
+    @classmethod
+    def sum_tax_by_date_range(cls, start_date: date, end_date: date) -> tuple:
+        """(count, taxable, cgst, sgst, igst, grand_total) over non-cancelled invoices"""
+        with pool.acquire_read() as conn:
+            return _tuple_cursor(conn).execute("""
+                SELECT COUNT(*), COALESCE(SUM(subtotal), 0), COALESCE(SUM(cgst_total), 0),
+                       COALESCE(SUM(sgst_total), 0), COALESCE(SUM(igst_total), 0),
+                       COALESCE(SUM(grand_total), 0)
+                FROM invoices
                 WHERE invoice_date BETWEEN ? AND ? AND is_cancelled = 0
-                ORDER BY invoice_date DESC, id DESC
-            """, (start_date.isoformat(), end_date.isoformat())).fetchall()
-        conn.close()
-        return [cls.get_by_id(row['id']) for row in rows]
+            """, (start_date, end_date)).fetchone()
+
+    @classmethod
+    def sum_tax_by_rate(cls, start_date: date, end_date: date) -> List[tuple]:
+        """(gst_rate, item count, taxable, cgst, sgst, igst) per rate over non-cancelled invoices"""
+        with pool.acquire_read() as conn:
+            return _tuple_cursor(conn).execute("""
+                SELECT ii.gst_rate, COUNT(*), SUM(ii.taxable_value), SUM(ii.cgst),
+                       SUM(ii.sgst), SUM(ii.igst)
+                FROM invoices i JOIN invoice_items ii ON ii.invoice_id = i.id
+                WHERE i.invoice_date BETWEEN ? AND ? AND i.is_cancelled = 0
+                GROUP BY ii.gst_rate
+            """, (start_date, end_date)).fetchall()
 
     @classmethod
     def get_next_invoice_number(cls) -> str:
@@ -340,77 +798,48 @@ class Invoice:
         fy_str = f"{fy_start}-{str(fy_end)[-2:]}"
         prefix = f"{INVOICE_PREFIX}/{fy_str}/"
 
-        conn = get_connection()
-        row = conn.execute("""
-            SELECT invoice_number FROM invoices
-            WHERE invoice_number LIKE ?
-            ORDER BY id DESC LIMIT 1
-        """, (f"{prefix}%",)).fetchone()
-        conn.close()
-
-        if row:
-            try:
-                last_num = int(row['invoice_number'].split('/')[-1])
-                next_num = last_num + 1
-            except ValueError:
-                next_num = 1
-        else:
-            next_num = 1
-
-        return f"{prefix}{next_num:04d}"
+        return _next_number(prefix)
 
     def save(self):
         """Save invoice and items"""
-        conn = get_connection()
-
-        if self.id:
-            conn.execute("""
-                UPDATE invoices SET invoice_number=?, invoice_date=?, customer_id=?,
-                customer_name=?, subtotal=?, cgst_total=?, sgst_total=?, igst_total=?,
-                discount=?, grand_total=?, payment_mode=?, is_cancelled=?,
-                amount_paid=?, balance_due=?, payment_status=?,
-                vehicle_number=?, transport_mode=?, transport_distance=?,
-                transporter_id=?, eway_bill_number=?
-                WHERE id=?
-            """, (self.invoice_number, self.invoice_date.isoformat(), self.customer_id,
-                  self.customer_name, self.subtotal, self.cgst_total, self.sgst_total,
-                  self.igst_total, self.discount, self.grand_total, self.payment_mode,
-                  self.is_cancelled, self.amount_paid, self.balance_due, self.payment_status,
-                  self.vehicle_number, self.transport_mode, self.transport_distance,
-                  self.transporter_id, self.eway_bill_number, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO invoices (invoice_number, invoice_date, customer_id, customer_name,
-                subtotal, cgst_total, sgst_total, igst_total, discount, grand_total, payment_mode,
-                is_cancelled, amount_paid, balance_due, payment_status,
-                vehicle_number, transport_mode, transport_distance, transporter_id, eway_bill_number)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.invoice_number, self.invoice_date.isoformat(), self.customer_id,
-                  self.customer_name, self.subtotal, self.cgst_total, self.sgst_total,
-                  self.igst_total, self.discount, self.grand_total, self.payment_mode,
-                  self.is_cancelled, self.amount_paid, self.balance_due, self.payment_status,
-                  self.vehicle_number, self.transport_mode, self.transport_distance,
-                  self.transporter_id, self.eway_bill_number))
-            self.id = cursor.lastrowid
-
-        # Delete existing items and re-insert
-        conn.execute("DELETE FROM invoice_items WHERE invoice_id = ?", (self.id,))
-
-        for item in self.items:
-            item.invoice_id = self.id
-            conn.execute("""
-                INSERT INTO invoice_items (invoice_id, product_id, product_name, hsn_code,
-                qty, unit, rate, gst_rate, taxable_value, cgst, sgst, igst, total)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (item.invoice_id, item.product_id, item.product_name, item.hsn_code,
-                  item.qty, item.unit, item.rate, item.gst_rate, item.taxable_value,
-                  item.cgst, item.sgst, item.igst, item.total))
-
-        conn.commit()
-        conn.close()
-
-
-@dataclass
+        # Header and items are written in one savepoint on the writer thread
+        def write(cursor):
+            existing = bool(self.id)
+            if existing:
+                cursor.execute(UPDATE_INVOICE_SQL, (
+                    self.invoice_number, self.invoice_date, self.customer_id,
+                    self.customer_name, self.subtotal, self.cgst_total, self.sgst_total,
+                    self.igst_total, self.discount, self.grand_total, self.payment_mode,
+                    self.is_cancelled, self.amount_paid, self.balance_due, self.payment_status,
+                    self.vehicle_number, self.transport_mode, self.transport_distance,
+                    self.transporter_id, self.eway_bill_number, self.id))
+            else:
+                self.id = cursor.execute(INSERT_INVOICE_SQL, (
+                    self.invoice_number, self.invoice_date, self.customer_id,
+                    self.customer_name, self.subtotal, self.cgst_total, self.sgst_total,
+                    self.igst_total, self.discount, self.grand_total, self.payment_mode,
+                    self.is_cancelled, self.amount_paid, self.balance_due, self.payment_status,
+                    self.vehicle_number, self.transport_mode, self.transport_distance,
+                    self.transporter_id, self.eway_bill_number)).fetchone()[0]
+
+            # Upsert items by line number, then drop lines past the new end
+            for line_no, item in enumerate(self.items, 1):
+                item.invoice_id = self.id
+                item.line_no = line_no
+            for start in range(0, len(self.items), INVOICE_ITEM_CHUNK):
+                chunk = self.items[start:start + INVOICE_ITEM_CHUNK]
+                params = []
+                for item in chunk:
+                    params.extend((item.invoice_id, item.line_no, item.product_id, item.product_name,
+                                   item.hsn_code, item.qty, item.unit, item.rate, item.gst_rate,
+                                   item.taxable_value, item.cgst, item.sgst, item.igst, item.total))
+                cursor.execute(_upsert_invoice_items_sql(len(chunk)), params)
+            if existing:
+                cursor.execute(DELETE_TRAILING_INVOICE_ITEMS_SQL, (self.id, len(self.items)))
+        writer.run(write)
+
+
+@dataclass(**_MODEL_OPTS)
 class StockLog:
     id: Optional[int] = None
     product_id: Optional[int] = None
@@ -422,15 +851,18 @@ class StockLog:
     @classmethod
     def get_by_product(cls, product_id: int) -> List['StockLog']:
         """Get stock log for a product"""
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM stock_log WHERE product_id = ? ORDER BY created_at DESC
-        """, (product_id,)).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        return list(cls.iter_by_product(product_id))
+
+    @classmethod
+    def iter_by_product(cls, product_id: int) -> Iterator['StockLog']:
+        """Yield stock log entries for a product, newest first"""
+        sql = SELECT_STOCK_LOG + " WHERE product_id = ? ORDER BY created_at DESC"
+        with pool.acquire_read() as conn, closing(_tuple_cursor(conn).execute(sql, (product_id,))) as cursor:
+            for row in _stream_rows(cursor):
+                yield cls._make(row)
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class Category:
     """Product category model"""
     id: Optional[int] = None
@@ -442,38 +874,35 @@ class Category:
     def get_all(cls, active_only: bool = True) -> List['Category']:
         """Get all categories"""
         conn = get_connection()
-        query = "SELECT * FROM categories"
+        query = SELECT_CATEGORIES
         if active_only:
             query += " WHERE is_active = 1"
         query += " ORDER BY name"
-        rows = conn.execute(query).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        rows = _tuple_cursor(conn).execute(query).fetchall()
+        return [cls._make(row) for row in rows]
 
     @classmethod
     def get_by_id(cls, category_id: int) -> Optional['Category']:
         """Get category by ID"""
-        conn = get_connection()
-        row = conn.execute("SELECT * FROM categories WHERE id = ?", (category_id,)).fetchone()
-        conn.close()
+        row = _category_row_by_id(category_id)
         if row:
-            return cls(**dict(row))
+            return cls._make(row)
         return None
 
     def save(self):
         """Save or update category"""
-        conn = get_connection()
-        if self.id:
-            conn.execute("""
-                UPDATE categories SET name=?, description=?, is_active=? WHERE id=?
-            """, (self.name, self.description, self.is_active, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO categories (name, description, is_active) VALUES (?, ?, ?)
-            """, (self.name, self.description, self.is_active))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        def write(cursor):
+            if self.id:
+                cursor.execute("""
+                    UPDATE categories SET name=?, description=?, is_active=? WHERE id=?
+                """, (self.name, self.description, self.is_active, self.id))
+            else:
+                cursor.execute("""
+                    INSERT INTO categories (name, description, is_active) VALUES (?, ?, ?)
+                """, (self.name, self.description, self.is_active))
+                self.id = cursor.lastrowid
+        writer.run(write)
+        _category_row_by_id.cache_clear()
 
     def delete(self):
         """Soft delete category"""
@@ -481,7 +910,7 @@ class Category:
         self.save()
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class HeldBill:
     """Held bill for hold/recall feature"""
     id: Optional[int] = None
@@ -491,88 +920,102 @@ class HeldBill:
     items_json: str = "[]"
     discount: float = 0.0
     created_at: Optional[datetime] = None
+    # Parsed items_json, filled on first access and written back by save()
+    _items_cache: Optional[list] = field(default=None, init=False, repr=False, compare=False)
+    _items_dirty: bool = field(default=False, init=False, repr=False, compare=False)
+
+    @property
+    def items(self) -> list:
+        """Held cart items, parsed from items_json once"""
+        if self._items_cache is None:
+            self._items_cache = _json_loads(self.items_json or "[]")
+        return self._items_cache
+
+    @items.setter
+    def items(self, items: list):
+        self._items_cache = items
+        self._items_dirty = True
 
     @classmethod
     def get_all(cls) -> List['HeldBill']:
         """Get all held bills"""
         conn = get_connection()
-        rows = conn.execute("SELECT * FROM held_bills ORDER BY created_at DESC").fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        rows = _tuple_cursor(conn).execute(SELECT_HELD_BILLS + " ORDER BY created_at DESC").fetchall()
+        return [cls._make(row) for row in rows]
 
     @classmethod
     def get_by_id(cls, bill_id: int) -> Optional['HeldBill']:
         """Get held bill by ID"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM held_bills WHERE id = ?", (bill_id,)).fetchone()
-        conn.close()
+        row = _tuple_cursor(conn).execute(SELECT_HELD_BILLS + " WHERE id = ?", (bill_id,)).fetchone()
         if row:
-            return cls(**dict(row))
+            return cls._make(row)
         return None
 
     def save(self):
         """Save held bill"""
-        conn = get_connection()
-        if self.id:
-            conn.execute("""
-                UPDATE held_bills SET hold_name=?, customer_id=?, customer_name=?,
-                items_json=?, discount=? WHERE id=?
-            """, (self.hold_name, self.customer_id, self.customer_name,
-                  self.items_json, self.discount, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO held_bills (hold_name, customer_id, customer_name, items_json, discount)
-                VALUES (?, ?, ?, ?, ?)
-            """, (self.hold_name, self.customer_id, self.customer_name,
-                  self.items_json, self.discount))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        if self._items_dirty:
+            self.items_json = _json_dumps(self._items_cache)
+            self._items_dirty = False
+        def write(cursor):
+            if self.id:
+                cursor.execute("""
+                    UPDATE held_bills SET hold_name=?, customer_id=?, customer_name=?,
+                    items_json=?, discount=? WHERE id=?
+                """, (self.hold_name, self.customer_id, self.customer_name,
+                      self.items_json, self.discount, self.id))
+            else:
+                cursor.execute("""
+                    INSERT INTO held_bills (hold_name, customer_id, customer_name, items_json, discount)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (self.hold_name, self.customer_id, self.customer_name,
+                      self.items_json, self.discount))
+                self.id = cursor.lastrowid
+        writer.run(write)
 
     def delete(self):
         """Delete held bill"""
-        conn = get_connection()
-        conn.execute("DELETE FROM held_bills WHERE id = ?", (self.id,))
-        conn.commit()
-        conn.close()
+        writer.execute("DELETE FROM held_bills WHERE id = ?", (self.id,))
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class AppSettings:
     """Application settings (key-value store)"""
     key: str = ""
     value: str = ""
 
+    # Every setting, loaded on first read and kept in step by set()
+    _cache: ClassVar[Optional[dict]] = None
+
+    @classmethod
+    def _load(cls) -> dict:
+        """Load all settings into the in-memory cache"""
+        if cls._cache is None:
+            with pool.acquire_read() as conn:
+                rows = _tuple_cursor(conn).execute("SELECT key, value FROM app_settings").fetchall()
+            cls._cache = dict(rows)
+        return cls._cache
+
     @classmethod
     def get(cls, key: str, default: str = "") -> str:
         """Get a setting value"""
-        conn = get_connection()
-        row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (key,)).fetchone()
-        conn.close()
-        if row:
-            return row['value']
-        return default
+        return cls._load().get(key, default)
 
     @classmethod
     def set(cls, key: str, value: str):
         """Set a setting value"""
-        conn = get_connection()
-        conn.execute("""
+        writer.execute("""
             INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)
         """, (key, value))
-        conn.commit()
-        conn.close()
+        cls._load()[key] = value
 
     @classmethod
     def get_all(cls) -> dict:
         """Get all settings as a dictionary"""
-        conn = get_connection()
-        rows = conn.execute("SELECT key, value FROM app_settings").fetchall()
-        conn.close()
-        return {row['key']: row['value'] for row in rows}
+        return dict(cls._load())
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class InvoicePayment:
     """Payment record for split payments"""
     id: Optional[int] = None
@@ -588,54 +1031,64 @@ class InvoicePayment:
     def get_by_invoice(cls, invoice_id: int) -> List['InvoicePayment']:
         """Get all payments for an invoice"""
         conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM invoice_payments
+        rows = _tuple_cursor(conn).execute(SELECT_INVOICE_PAYMENTS + """
             WHERE invoice_id = ?
             ORDER BY payment_date, id
         """, (invoice_id,)).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        return [cls._make(row) for row in rows]
 
     @classmethod
-    def get_by_date_range(cls, start_date: date, end_date: date) -> List['InvoicePayment']:
-        """Get payments in date range"""
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM invoice_payments
+    def iter_by_date_range(cls, start_date: date, end_date: date) -> Iterator['InvoicePayment']:
+        """Yield payments in date range, newest first"""
+        sql = SELECT_INVOICE_PAYMENTS + """
             WHERE payment_date BETWEEN ? AND ?
             ORDER BY payment_date DESC, id DESC
-        """, (start_date.isoformat(), end_date.isoformat())).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        """
+        params = (start_date, end_date)
+        with pool.acquire_read() as conn, closing(_tuple_cursor(conn).execute(sql, params)) as cursor:
+            for row in _stream_rows(cursor):
+                yield cls._make(row)
+
+    @classmethod
+    def get_by_date_range(cls, start_date: date, end_date: date) -> List['InvoicePayment']:
+        """Get payments in date range"""
+        return list(cls.iter_by_date_range(start_date, end_date))
+
+    @classmethod
+    def sum_by_mode(cls, start_date: date, end_date: date) -> List[tuple]:
+        """(payment_mode, count, amount) totals for payments in date range"""
+        with pool.acquire_read() as conn:
+            return _tuple_cursor(conn).execute("""
+                SELECT payment_mode, COUNT(*), COALESCE(SUM(amount), 0)
+                FROM invoice_payments
+                WHERE payment_date BETWEEN ? AND ?
+                GROUP BY payment_mode
+            """, (start_date, end_date)).fetchall()
 
     def save(self):
         """Save payment record"""
-        conn = get_connection()
-        if self.id:
-            conn.execute("""
-                UPDATE invoice_payments SET invoice_id=?, payment_mode=?, amount=?,
-                payment_date=?, reference_number=?, notes=? WHERE id=?
-            """, (self.invoice_id, self.payment_mode, self.amount,
-                  self.payment_date.isoformat(), self.reference_number, self.notes, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO invoice_payments (invoice_id, payment_mode, amount, payment_date, reference_number, notes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (self.invoice_id, self.payment_mode, self.amount,
-                  self.payment_date.isoformat(), self.reference_number, self.notes))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        def write(cursor):
+            if self.id:
+                cursor.execute("""
+                    UPDATE invoice_payments SET invoice_id=?, payment_mode=?, amount=?,
+                    payment_date=?, reference_number=?, notes=? WHERE id=?
+                """, (self.invoice_id, self.payment_mode, self.amount,
+                      self.payment_date, self.reference_number, self.notes, self.id))
+            else:
+                cursor.execute("""
+                    INSERT INTO invoice_payments (invoice_id, payment_mode, amount, payment_date, reference_number, notes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (self.invoice_id, self.payment_mode, self.amount,
+                      self.payment_date, self.reference_number, self.notes))
+                self.id = cursor.lastrowid
+        writer.run(write)
 
     def delete(self):
         """Delete payment record"""
-        conn = get_connection()
-        conn.execute("DELETE FROM invoice_payments WHERE id = ?", (self.id,))
-        conn.commit()
-        conn.close()
+        writer.execute("DELETE FROM invoice_payments WHERE id = ?", (self.id,))
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class CreditNoteItem:
     """Credit note line item"""
     id: Optional[int] = None
@@ -654,7 +1107,7 @@ class CreditNoteItem:
     total: float = 0.0
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class CreditNote:
     """Credit note for returns and refunds"""
     id: Optional[int] = None
@@ -679,60 +1132,66 @@ class CreditNote:
     def get_by_id(cls, credit_note_id: int) -> Optional['CreditNote']:
         """Get credit note by ID with items"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM credit_notes WHERE id = ?", (credit_note_id,)).fetchone()
+        row = _tuple_cursor(conn).execute(SELECT_CREDIT_NOTES + " WHERE id = ?", (credit_note_id,)).fetchone()
         if not row:
-            conn.close()
             return None
 
-        credit_note = cls(**{k: v for k, v in dict(row).items() if k != 'items'})
+        credit_note = cls._make(row)
 
         # Get items
-        items = conn.execute("SELECT * FROM credit_note_items WHERE credit_note_id = ?", (credit_note_id,)).fetchall()
-        credit_note.items = [CreditNoteItem(**dict(item)) for item in items]
+        items = _tuple_cursor(conn).execute(
+            SELECT_CREDIT_NOTE_ITEMS + " WHERE credit_note_id = ?", (credit_note_id,)).fetchall()
+        credit_note.items = [CreditNoteItem._make(item) for item in items]
 
-        conn.close()
         return credit_note
 
     @classmethod
     def get_by_number(cls, credit_note_number: str) -> Optional['CreditNote']:
         """Get credit note by number"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM credit_notes WHERE credit_note_number = ?", (credit_note_number,)).fetchone()
-        conn.close()
+        row = conn.execute("SELECT id FROM credit_notes WHERE credit_note_number = ?", (credit_note_number,)).fetchone()
         if row:
-            return cls.get_by_id(row['id'])
+            return cls.get_by_id(row[0])
         return None
 
+    @classmethod
+    def _load_with_items(cls, conn, where: str, params: tuple, order_by: str) -> List['CreditNote']:
+        """Load matching credit notes and all of their items in two queries"""
+        rows = _tuple_cursor(conn).execute(
+            f"{SELECT_CREDIT_NOTES} WHERE {where} ORDER BY {order_by}", params).fetchall()
+        if not rows:
+            return []
+
+        items_by_note = defaultdict(list)
+        for item in _tuple_cursor(conn).execute(f"""
+            {SELECT_CREDIT_NOTE_ITEMS}
+            WHERE credit_note_id IN (SELECT id FROM credit_notes WHERE {where})
+            ORDER BY id
+        """, params):
+            items_by_note[item[1]].append(CreditNoteItem._make(item))
+
+        credit_notes = []
+        for row in rows:
+            credit_note = cls._make(row)
+            credit_note.items = items_by_note[credit_note.id]
+            credit_notes.append(credit_note)
+        return credit_notes
+
     @classmethod
     def get_by_date_range(cls, start_date: date, end_date: date, include_cancelled: bool = False) -> List['CreditNote']:
         """Get credit notes in date range"""
-        conn = get_connection()
-        if include_cancelled:
-            rows = conn.execute("""
-                SELECT * FROM credit_notes
-                WHERE credit_note_date BETWEEN ? AND ?
-                ORDER BY credit_note_date DESC, id DESC
-            """, (start_date.isoformat(), end_date.isoformat())).fetchall()
-        else:
-            rows = conn.execute("""
-                SELECT * FROM credit_notes
-                WHERE credit_note_date BETWEEN ? AND ? AND status != 'CANCELLED'
-                ORDER BY credit_note_date DESC, id DESC
-            """, (start_date.isoformat(), end_date.isoformat())).fetchall()
-        conn.close()
-        return [cls.get_by_id(row['id']) for row in rows]
+        where = "credit_note_date BETWEEN ? AND ?"
+        if not include_cancelled:
+            where += " AND status != 'CANCELLED'"
+        with pool.acquire_read() as conn:
+            return cls._load_with_items(conn, where, (start_date, end_date),
+                                        "credit_note_date DESC, id DESC")
 
     @classmethod
     def get_by_invoice(cls, invoice_id: int) -> List['CreditNote']:
         """Get credit notes for an invoice"""
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM credit_notes
-            WHERE original_invoice_id = ?
-            ORDER BY credit_note_date DESC
-        """, (invoice_id,)).fetchall()
-        conn.close()
-        return [cls.get_by_id(row['id']) for row in rows]
+        return cls._load_with_items(get_connection(), "original_invoice_id = ?", (invoice_id,),
+                                    "credit_note_date DESC")
 
     @classmethod
     def get_next_credit_note_number(cls) -> str:
@@ -750,81 +1209,42 @@ class CreditNote:
         fy_str = f"{fy_start}-{str(fy_end)[-2:]}"
         prefix = f"CN/{fy_str}/"
 
-        conn = get_connection()
-        row = conn.execute("""
-            SELECT credit_note_number FROM credit_notes
-            WHERE credit_note_number LIKE ?
-            ORDER BY id DESC LIMIT 1
-        """, (f"{prefix}%",)).fetchone()
-        conn.close()
-
-        if row:
-            try:
-                last_num = int(row['credit_note_number'].split('/')[-1])
-                next_num = last_num + 1
-            except ValueError:
-                next_num = 1
-        else:
-            next_num = 1
-
-        return f"{prefix}{next_num:04d}"
+        return _next_number(prefix)
 
     def save(self):
         """Save credit note and items"""
-        conn = get_connection()
-
-        if self.id:
-            conn.execute("""
-                UPDATE credit_notes SET credit_note_number=?, credit_note_date=?,
-                original_invoice_id=?, original_invoice_number=?, customer_id=?,
-                customer_name=?, reason=?, reason_details=?, subtotal=?, cgst_total=?,
-                sgst_total=?, igst_total=?, grand_total=?, status=?
-                WHERE id=?
-            """, (self.credit_note_number, self.credit_note_date.isoformat(),
-                  self.original_invoice_id, self.original_invoice_number, self.customer_id,
-                  self.customer_name, self.reason, self.reason_details, self.subtotal,
-                  self.cgst_total, self.sgst_total, self.igst_total, self.grand_total,
-                  self.status, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO credit_notes (credit_note_number, credit_note_date,
-                original_invoice_id, original_invoice_number, customer_id, customer_name,
-                reason, reason_details, subtotal, cgst_total, sgst_total, igst_total,
-                grand_total, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.credit_note_number, self.credit_note_date.isoformat(),
-                  self.original_invoice_id, self.original_invoice_number, self.customer_id,
-                  self.customer_name, self.reason, self.reason_details, self.subtotal,
-                  self.cgst_total, self.sgst_total, self.igst_total, self.grand_total,
-                  self.status))
-            self.id = cursor.lastrowid
-
-        # Delete existing items and re-insert
-        conn.execute("DELETE FROM credit_note_items WHERE credit_note_id = ?", (self.id,))
-
-        for item in self.items:
-            item.credit_note_id = self.id
-            conn.execute("""
-                INSERT INTO credit_note_items (credit_note_id, product_id, product_name, hsn_code,
-                qty, unit, rate, gst_rate, taxable_value, cgst, sgst, igst, total)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (item.credit_note_id, item.product_id, item.product_name, item.hsn_code,
-                  item.qty, item.unit, item.rate, item.gst_rate, item.taxable_value,
-                  item.cgst, item.sgst, item.igst, item.total))
-
-        conn.commit()
-        conn.close()
+        def write(cursor):
+            if self.id:
+                cursor.execute(UPDATE_CREDIT_NOTE_SQL, (
+                    self.credit_note_number, self.credit_note_date,
+                    self.original_invoice_id, self.original_invoice_number, self.customer_id,
+                    self.customer_name, self.reason, self.reason_details, self.subtotal,
+                    self.cgst_total, self.sgst_total, self.igst_total, self.grand_total,
+                    self.status, self.id))
+            else:
+                cursor.execute(INSERT_CREDIT_NOTE_SQL, (
+                    self.credit_note_number, self.credit_note_date,
+                    self.original_invoice_id, self.original_invoice_number, self.customer_id,
+                    self.customer_name, self.reason, self.reason_details, self.subtotal,
+                    self.cgst_total, self.sgst_total, self.igst_total, self.grand_total,
+                    self.status))
+                self.id = cursor.lastrowid
+
+            # Delete existing items and re-insert
+            cursor.execute("DELETE FROM credit_note_items WHERE credit_note_id = ?", (self.id,))
+
+            for item in self.items:
+                item.credit_note_id = self.id
+            _insert_rows(cursor, "credit_note_items", CREDIT_NOTE_ITEM_COLS[1:], self.items)
+        writer.run(write)
 
     def cancel(self):
         """Cancel credit note"""
         self.status = "CANCELLED"
-        conn = get_connection()
-        conn.execute("UPDATE credit_notes SET status = 'CANCELLED' WHERE id = ?", (self.id,))
-        conn.commit()
-        conn.close()
+        writer.execute("UPDATE credit_notes SET status = 'CANCELLED' WHERE id = ?", (self.id,))
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class QuotationItem:
     """Quotation line item"""
     id: Optional[int] = None
@@ -843,7 +1263,7 @@ class QuotationItem:
     total: float = 0.0
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class Quotation:
     """Quotation/Estimate model"""
     id: Optional[int] = None
@@ -863,90 +1283,138 @@ class Quotation:
     terms_conditions: str = ""
     converted_invoice_id: Optional[int] = None
     created_at: Optional[datetime] = None
+    # None on quotations from the headers-only queries until load_items() is called
     items: List[QuotationItem] = field(default_factory=list)
+    _saved: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    # Item values as last loaded or saved, so save() can tell the items are unchanged
+    _saved_items: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
 
     # Class constants
     STATUSES = ["DRAFT", "SENT", "ACCEPTED", "REJECTED", "EXPIRED", "CONVERTED"]
     DEFAULT_VALIDITY_DAYS = 30
 
+    def __post_init__(self):
+        # Loaded rows start clean so an unchanged save() is skipped
+        self._saved = _column_values(self, QUOTATION_COLS) if self.id else None
+
+    def _item_values(self) -> Optional[tuple]:
+        """Snapshot of the item values, or None when items were not loaded"""
+        if self.items is None:
+            return None
+        return tuple(map(_values_getter(QUOTATION_ITEM_VALUE_COLS), self.items))
+
     @classmethod
     def get_by_id(cls, quotation_id: int) -> Optional['Quotation']:
         """Get quotation by ID with items"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM quotations WHERE id = ?", (quotation_id,)).fetchone()
+        row = _tuple_cursor(conn).execute(SELECT_QUOTATIONS + " WHERE id = ?", (quotation_id,)).fetchone()
         if not row:
-            conn.close()
             return None
 
-        quotation = cls(**{k: v for k, v in dict(row).items() if k != 'items'})
-
-        # Convert date strings to date objects
-        if isinstance(quotation.quotation_date, str):
-            quotation.quotation_date = date.fromisoformat(quotation.quotation_date)
-        if isinstance(quotation.validity_date, str):
-            quotation.validity_date = date.fromisoformat(quotation.validity_date)
+        quotation = cls._make(row)
 
         # Get items
-        items = conn.execute("SELECT * FROM quotation_items WHERE quotation_id = ?", (quotation_id,)).fetchall()
-        quotation.items = [QuotationItem(**dict(item)) for item in items]
+        items = _tuple_cursor(conn).execute(QUOTATION_ITEMS_BY_QUOTATION_SQL, (quotation_id,)).fetchall()
+        quotation.items = [QuotationItem._make(item) for item in items]
+        quotation._saved_items = quotation._item_values()
 
-        conn.close()
         return quotation
 
     @classmethod
     def get_by_number(cls, quotation_number: str) -> Optional['Quotation']:
         """Get quotation by number"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM quotations WHERE quotation_number = ?", (quotation_number,)).fetchone()
-        conn.close()
+        row = conn.execute("SELECT id FROM quotations WHERE quotation_number = ?", (quotation_number,)).fetchone()
         if row:
-            return cls.get_by_id(row['id'])
+            return cls.get_by_id(row[0])
         return None
 
+    @classmethod
+    def _load_headers(cls, conn, where: str, params: tuple, order_by: str) -> List['Quotation']:
+        """Load matching quotations without querying their items"""
+        rows = _tuple_cursor(conn).execute(
+            f"{SELECT_QUOTATIONS} WHERE {where} ORDER BY {order_by}", params).fetchall()
+        quotations = [cls._make(row) for row in rows]
+        for quotation in quotations:
+            quotation.items = None
+        return quotations
+
+    @classmethod
+    def _load_with_items(cls, conn, where: str, params: tuple, order_by: str) -> List['Quotation']:
+        """Load matching quotations and all of their items in two queries"""
+        quotations = cls._load_headers(conn, where, params, order_by)
+        if not quotations:
+            return []
+
+        items_by_quotation = defaultdict(list)
+        for item in _tuple_cursor(conn).execute(f"""
+            {SELECT_QUOTATION_ITEMS}
+            WHERE quotation_id IN (SELECT id FROM quotations WHERE {where})
+            ORDER BY id
+        """, params):
+            items_by_quotation[item[1]].append(QuotationItem._make(item))
+
+        for quotation in quotations:
+            quotation.items = items_by_quotation[quotation.id]
+            quotation._saved_items = quotation._item_values()
+        return quotations
+
+    @staticmethod
+    def _date_range_filter(start_date: date, end_date: date, status: Optional[str]) -> tuple:
+        """WHERE clause and parameters for a date range and optional status"""
+        where = "quotation_date BETWEEN ? AND ?"
+        params = (start_date, end_date)
+        if status:
+            where += " AND status = ?"
+            params += (status,)
+        return where, params
+
     @classmethod
     def get_by_date_range(cls, start_date: date, end_date: date, status: str = None) -> List['Quotation']:
         """Get quotations in date range, optionally filtered by status"""
-        conn = get_connection()
-        if status:
-            rows = conn.execute("""
-                SELECT * FROM quotations
-                WHERE quotation_date BETWEEN ? AND ? AND status = ?
-                ORDER BY quotation_date DESC, id DESC
-            """, (start_date.isoformat(), end_date.isoformat(), status)).fetchall()
-        else:
-            rows = conn.execute("""
-                SELECT * FROM quotations
-                WHERE quotation_date BETWEEN ? AND ?
-                ORDER BY quotation_date DESC, id DESC
-            """, (start_date.isoformat(), end_date.isoformat())).fetchall()
-        conn.close()
-        return [cls.get_by_id(row['id']) for row in rows]
+        where, params = cls._date_range_filter(start_date, end_date, status)
+        with pool.acquire_read() as conn:
+            return cls._load_with_items(conn, where, params, "quotation_date DESC, id DESC")
+
+    @classmethod
+    def get_headers_by_date_range(cls, start_date: date, end_date: date, status: str = None) -> List['Quotation']:
+        """Get quotations in date range without their items, for list views"""
+        where, params = cls._date_range_filter(start_date, end_date, status)
+        with pool.acquire_read() as conn:
+            return cls._load_headers(conn, where, params, "quotation_date DESC, id DESC")
 
     @classmethod
     def get_by_customer(cls, customer_id: int) -> List['Quotation']:
         """Get quotations for a customer"""
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM quotations
-            WHERE customer_id = ?
-            ORDER BY quotation_date DESC
-        """, (customer_id,)).fetchall()
-        conn.close()
-        return [cls.get_by_id(row['id']) for row in rows]
+        with pool.acquire_read() as conn:
+            return cls._load_with_items(conn, "customer_id = ?", (customer_id,), "quotation_date DESC")
+
+    @classmethod
+    def get_by_status(cls, status: str) -> List['Quotation']:
+        """Get quotations with a status, soonest to expire first"""
+        with pool.acquire_read() as conn:
+            return cls._load_with_items(conn, "status = ?", (status,), "validity_date")
 
     @classmethod
     def get_expiring_soon(cls, days: int = 7) -> List['Quotation']:
         """Get quotations expiring within N days"""
         today = date.today()
         expiry_date = today + timedelta(days=days)
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM quotations
-            WHERE validity_date BETWEEN ? AND ? AND status IN ('DRAFT', 'SENT')
-            ORDER BY validity_date
-        """, (today.isoformat(), expiry_date.isoformat())).fetchall()
-        conn.close()
-        return [cls.get_by_id(row['id']) for row in rows]
+        with pool.acquire_read() as conn:
+            return cls._load_with_items(
+                conn, "validity_date BETWEEN ? AND ? AND status IN ('DRAFT', 'SENT')",
+                (today, expiry_date), "validity_date")
+
+    @classmethod
+    def stats_by_date_range(cls, start_date: date, end_date: date) -> Dict[str, tuple]:
+        """Count and total value per status for quotations in date range"""
+        with pool.acquire_read() as conn:
+            rows = conn.execute("""
+                SELECT status, COUNT(*), COALESCE(SUM(grand_total), 0) FROM quotations
+                WHERE quotation_date BETWEEN ? AND ?
+                GROUP BY status
+            """, (start_date, end_date)).fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
 
     @classmethod
     def get_next_quotation_number(cls) -> str:
@@ -964,78 +1432,100 @@ class Quotation:
         fy_str = f"{fy_start}-{str(fy_end)[-2:]}"
         prefix = f"QTN/{fy_str}/"
 
-        conn = get_connection()
-        row = conn.execute("""
-            SELECT quotation_number FROM quotations
-            WHERE quotation_number LIKE ?
-            ORDER BY id DESC LIMIT 1
-        """, (f"{prefix}%",)).fetchone()
-        conn.close()
-
-        if row:
-            try:
-                last_num = int(row['quotation_number'].split('/')[-1])
-                next_num = last_num + 1
-            except ValueError:
-                next_num = 1
-        else:
-            next_num = 1
-
-        return f"{prefix}{next_num:04d}"
-
-    def save(self):
-        """Save quotation and items"""
-        conn = get_connection()
-
-        if self.id:
-            conn.execute("""
-                UPDATE quotations SET quotation_number=?, quotation_date=?, validity_date=?,
-                customer_id=?, customer_name=?, subtotal=?, cgst_total=?, sgst_total=?,
-                igst_total=?, discount=?, grand_total=?, status=?, notes=?,
-                terms_conditions=?, converted_invoice_id=?
-                WHERE id=?
-            """, (self.quotation_number, self.quotation_date.isoformat(),
-                  self.validity_date.isoformat(), self.customer_id, self.customer_name,
-                  self.subtotal, self.cgst_total, self.sgst_total, self.igst_total,
-                  self.discount, self.grand_total, self.status, self.notes,
-                  self.terms_conditions, self.converted_invoice_id, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO quotations (quotation_number, quotation_date, validity_date,
-                customer_id, customer_name, subtotal, cgst_total, sgst_total, igst_total,
-                discount, grand_total, status, notes, terms_conditions, converted_invoice_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.quotation_number, self.quotation_date.isoformat(),
-                  self.validity_date.isoformat(), self.customer_id, self.customer_name,
-                  self.subtotal, self.cgst_total, self.sgst_total, self.igst_total,
-                  self.discount, self.grand_total, self.status, self.notes,
-                  self.terms_conditions, self.converted_invoice_id))
-            self.id = cursor.lastrowid
-
-        # Delete existing items and re-insert
-        conn.execute("DELETE FROM quotation_items WHERE quotation_id = ?", (self.id,))
-
-        for item in self.items:
-            item.quotation_id = self.id
-            conn.execute("""
-                INSERT INTO quotation_items (quotation_id, product_id, product_name, hsn_code,
-                qty, unit, rate, gst_rate, taxable_value, cgst, sgst, igst, total)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (item.quotation_id, item.product_id, item.product_name, item.hsn_code,
-                  item.qty, item.unit, item.rate, item.gst_rate, item.taxable_value,
-                  item.cgst, item.sgst, item.igst, item.total))
-
-        conn.commit()
-        conn.close()
+        return _next_number(prefix)
+
+    def load_items(self) -> List[QuotationItem]:
+        """Load the items of a quotation that came from a headers-only query"""
+        with pool.acquire_read() as conn:
+            rows = _tuple_cursor(conn).execute(QUOTATION_ITEMS_BY_QUOTATION_SQL, (self.id,)).fetchall()
+        self.items = [QuotationItem._make(row) for row in rows]
+        self._saved_items = self._item_values()
+        return self.items
+
+    def save(self, force: bool = False):
+        """Save quotation and items; force rewrites every item instead of only the changed ones"""
+        values = _column_values(self, QUOTATION_COLS)
+        item_values = self._item_values()
+        header_changed = force or values != self._saved
+        items_changed = item_values is not None and (force or item_values != self._saved_items)
+        if self.id and not header_changed and not items_changed:
+            return
+
+        def write(cursor):
+            existing = bool(self.id)
+            if existing and header_changed:
+                # Only the columns that differ from the loaded row are written
+                cols = [col for i, col in enumerate(QUOTATION_COLS[1:-1], 1)
+                        if force or self._saved is None or values[i] != self._saved[i]]
+                cursor.execute(_update_columns_sql("quotations", tuple(cols)),
+                               (*(getattr(self, col) for col in cols), self.id))
+            elif not existing:
+                cursor.execute("""
+                    INSERT INTO quotations (quotation_number, quotation_date, validity_date,
+                    customer_id, customer_name, subtotal, cgst_total, sgst_total, igst_total,
+                    discount, grand_total, status, notes, terms_conditions, converted_invoice_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (self.quotation_number, self.quotation_date,
+                      self.validity_date, self.customer_id, self.customer_name,
+                      self.subtotal, self.cgst_total, self.sgst_total, self.igst_total,
+                      self.discount, self.grand_total, self.status, self.notes,
+                      self.terms_conditions, self.converted_invoice_id))
+                self.id = cursor.lastrowid
+
+            if self.items is None or (existing and not items_changed):
+                # Items were never loaded or are as last saved
+                return
+            for item in self.items:
+                item.quotation_id = self.id
+            if existing and force:
+                cursor.execute("DELETE FROM quotation_items WHERE quotation_id = ?", (self.id,))
+            elif existing:
+                self._save_changed_items(cursor)
+                return
+            _insert_rows(cursor, "quotation_items", QUOTATION_ITEM_COLS[1:], self.items)
+        writer.run(write)
+        self._saved = _column_values(self, QUOTATION_COLS)
+        self._saved_items = item_values
+
+    def _save_changed_items(self, cursor: sqlite3.Cursor):
+        """Rewrite only the item rows that differ from the saved ones
+
+        The n-th item takes over the n-th saved row: unchanged rows are left
+        alone, changed ones are updated in place, extra items are appended and
+        surplus rows deleted, so the id order still follows the item order.
+        """
+        saved = cursor.execute(QUOTATION_ITEMS_BY_QUOTATION_SQL, (self.id,)).fetchall()
+        getter = _values_getter(QUOTATION_ITEM_VALUE_COLS)
+        updates = []
+        for item, row in zip(self.items, saved):
+            item.id = row[0]
+            values = getter(item)
+            if values != tuple(row[2:]):
+                updates.append((*values, item.id))
+        if updates:
+            cursor.executemany(UPDATE_QUOTATION_ITEM_SQL, updates)
+        if len(saved) > len(self.items):
+            cursor.execute("DELETE FROM quotation_items WHERE quotation_id = ? AND id >= ?",
+                           (self.id, saved[len(self.items)][0]))
+        _insert_rows(cursor, "quotation_items", QUOTATION_ITEM_COLS[1:], self.items[len(saved):])
 
     def update_status(self, new_status: str):
         """Update quotation status"""
         if new_status in self.STATUSES:
             self.status = new_status
-            conn = get_connection()
-            conn.execute("UPDATE quotations SET status = ? WHERE id = ?", (new_status, self.id))
-            conn.commit()
-            conn.close()
+            writer.execute("UPDATE quotations SET status = ? WHERE id = ?", (new_status, self.id))
+            _mark_column_saved(self, QUOTATION_COLS, 'status')
+
+    @classmethod
+    def expire_stale(cls) -> int:
+        """Mark every DRAFT or SENT quotation past its validity as EXPIRED, returning how many"""
+        def write(cursor):
+            cursor.execute("""
+                UPDATE quotations SET status = 'EXPIRED'
+                WHERE status IN ('DRAFT', 'SENT') AND validity_date < ?
+            """, (date.today(),))
+            return cursor.rowcount
+        return writer.run(write)
 
     def is_expired(self) -> bool:
         """Check if quotation has expired"""
@@ -1043,14 +1533,13 @@ class Quotation:
 
     def delete(self):
         """Delete quotation and items"""
-        conn = get_connection()
-        conn.execute("DELETE FROM quotation_items WHERE quotation_id = ?", (self.id,))
-        conn.execute("DELETE FROM quotations WHERE id = ?", (self.id,))
-        conn.commit()
-        conn.close()
+        def write(cursor):
+            cursor.execute("DELETE FROM quotation_items WHERE quotation_id = ?", (self.id,))
+            cursor.execute("DELETE FROM quotations WHERE id = ?", (self.id,))
+        writer.run(write)
 
 
-@dataclass
+@dataclass(**_MODEL_OPTS)
 class EmailQueueEntry:
     """Email queue entry for offline email support"""
     id: Optional[int] = None
@@ -1064,67 +1553,92 @@ class EmailQueueEntry:
     error_message: str = ""
     created_at: Optional[datetime] = None
     sent_at: Optional[datetime] = None
+    # The attachment as last loaded or saved; save() only writes pdf_data when it differs
+    _saved_pdf: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def get_by_id(cls, entry_id: int) -> Optional['EmailQueueEntry']:
         """Get queue entry by ID"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM email_queue WHERE id = ?", (entry_id,)).fetchone()
-        conn.close()
+        row = _tuple_cursor(conn).execute(SELECT_EMAIL_QUEUE + " WHERE id = ?", (entry_id,)).fetchone()
         if row:
-            return cls(**dict(row))
+            entry = cls._make(row)
+            entry.load_pdf()
+            return entry
         return None
 
     @classmethod
     def get_pending(cls) -> List['EmailQueueEntry']:
         """Get pending emails (including retryable failed ones)"""
         conn = get_connection()
-        rows = conn.execute("""
-            SELECT * FROM email_queue
+        rows = _tuple_cursor(conn).execute(SELECT_EMAIL_QUEUE + """
             WHERE status = 'PENDING' OR (status = 'FAILED' AND retry_count < 3)
             ORDER BY created_at ASC
         """).fetchall()
-        conn.close()
-        return [cls(**dict(row)) for row in rows]
+        return [cls._make(row) for row in rows]
 
     @classmethod
     def get_by_invoice(cls, invoice_id: int) -> Optional['EmailQueueEntry']:
         """Get queue entry for an invoice"""
         conn = get_connection()
-        row = conn.execute(
-            "SELECT * FROM email_queue WHERE invoice_id = ? ORDER BY created_at DESC LIMIT 1",
+        row = _tuple_cursor(conn).execute(
+            SELECT_EMAIL_QUEUE + " WHERE invoice_id = ? ORDER BY created_at DESC LIMIT 1",
             (invoice_id,)
         ).fetchone()
-        conn.close()
         if row:
-            return cls(**dict(row))
+            return cls._make(row)
         return None
 
+    def load_pdf(self) -> Optional[bytes]:
+        """Read the attachment, which the list queries leave out"""
+        with pool.acquire_read() as conn:
+            row = conn.execute("SELECT length(pdf_data) FROM email_queue_pdfs WHERE entry_id = ?",
+                               (self.id,)).fetchone()
+            if row:
+                self.pdf_data = read_blob(conn, 'email_queue_pdfs', 'pdf_data', self.id)
+            else:
+                self.pdf_data = None
+        self._saved_pdf = self.pdf_data
+        return self.pdf_data
+
     def save(self):
         """Save or update queue entry"""
-        conn = get_connection()
-        if self.id:
-            conn.execute("""
-                UPDATE email_queue SET invoice_id=?, recipient_email=?, subject=?,
-                body=?, pdf_data=?, status=?, retry_count=?, error_message=?, sent_at=?
-                WHERE id=?
-            """, (self.invoice_id, self.recipient_email, self.subject, self.body,
-                  self.pdf_data, self.status, self.retry_count, self.error_message,
-                  self.sent_at, self.id))
-        else:
-            cursor = conn.execute("""
-                INSERT INTO email_queue (invoice_id, recipient_email, subject, body,
-                pdf_data, status, retry_count, error_message)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (self.invoice_id, self.recipient_email, self.subject, self.body,
-                  self.pdf_data, self.status, self.retry_count, self.error_message))
-            self.id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        def write(cursor):
+            if self.id:
+                cursor.execute("""
+                    UPDATE email_queue SET invoice_id=?, recipient_email=?, subject=?,
+                    body=?, status=?, retry_count=?, error_message=?, sent_at=?
+                    WHERE id=?
+                """, (self.invoice_id, self.recipient_email, self.subject, self.body,
+                      self.status, self.retry_count, self.error_message,
+                      self.sent_at, self.id))
+            else:
+                cursor.execute("""
+                    INSERT INTO email_queue (invoice_id, recipient_email, subject, body,
+                    status, retry_count, error_message)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (self.invoice_id, self.recipient_email, self.subject, self.body,
+                      self.status, self.retry_count, self.error_message))
+                self.id = cursor.lastrowid
+            # Status changes leave the attachment row alone
+            if self.pdf_data is not None and self.pdf_data is not self._saved_pdf:
+                cursor.execute("INSERT OR REPLACE INTO email_queue_pdfs (entry_id, pdf_data) VALUES (?, ?)",
+                               (self.id, self.pdf_data))
+        writer.run(write)
+        self._saved_pdf = self.pdf_data
 
     def delete(self):
         """Delete queue entry"""
-        conn = get_connection()
-        conn.execute("DELETE FROM email_queue WHERE id = ?", (self.id,))
-        conn.commit()
-        conn.close()
+        writer.execute("DELETE FROM email_queue WHERE id = ?", (self.id,))
+
+
+# Generate each model's _make() now that the classes exist
+for _cls, _cols in ((Company, COMPANY_COLS), (Product, PRODUCT_COLS), (Customer, CUSTOMER_COLS),
+                    (InvoiceItem, INVOICE_ITEM_COLS), (Invoice, INVOICE_COLS),
+                    (StockLog, STOCK_LOG_COLS), (Category, CATEGORY_COLS),
+                    (HeldBill, HELD_BILL_COLS), (InvoicePayment, INVOICE_PAYMENT_COLS),
+                    (CreditNoteItem, CREDIT_NOTE_ITEM_COLS), (CreditNote, CREDIT_NOTE_COLS),
+                    (QuotationItem, QUOTATION_ITEM_COLS), (Quotation, QUOTATION_COLS),
+                    (EmailQueueEntry, EMAIL_QUEUE_COLS)):
+    _add_make(_cls, _cols)
+del _cls, _cols
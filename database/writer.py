@@ -0,0 +1,133 @@
+"""Single writer thread that applies every model write"""
+import atexit
+import queue
+import threading
+from concurrent.futures import Future
+from .db import get_connection
+
+# Most writes committed together in one transaction
+MAX_BATCH = 64
+
+_STOP = object()
+
+
+def _execute(cursor, sql: str, params) -> list:
+    """Run one statement and return any rows it produced"""
+    return cursor.execute(sql, params).fetchall()
+
+
+class Writer:
+    """Runs writes on one thread that owns the read-write connection
+
+    SQLite only lets one connection write at a time, so UI and worker
+    threads hand their writes to this thread instead of waiting on each
+    other's write lock. Writes that queue up while a transaction commits
+    go into the next one together, sharing a single commit; each runs in
+    its own savepoint so a failing write only undoes itself.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._cursor = None
+
+    def _start(self):
+        """Start the writer thread on first use"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        """Queue fn(cursor, *args) for the writer thread; the future resolves once committed"""
+        future = Future()
+        if threading.current_thread() is self._thread and self._cursor is not None:
+            # A write issued from inside another write joins its transaction
+            future.set_running_or_notify_cancel()
+            ok, value = self._apply(self._cursor, fn, args)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+            return future
+        self._start()
+        self._queue.put((future, fn, args))
+        return future
+
+    def run(self, fn, *args):
+        """Run fn(cursor, *args) on the writer thread and wait for its result"""
+        return self.submit(fn, *args).result()
+
+    def execute(self, sql: str, params=()) -> list:
+        """Run one statement on the writer thread and return any rows it produced"""
+        return self.run(_execute, sql, params)
+
+    def shutdown(self):
+        """Commit anything still queued and stop the writer thread"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    @staticmethod
+    def _apply(cursor, fn, args) -> tuple:
+        """Run one write inside a savepoint, returning (ok, result or exception)"""
+        cursor.execute("SAVEPOINT write")
+        try:
+            value = fn(cursor, *args)
+        except Exception as e:
+            cursor.execute("ROLLBACK TO write")
+            cursor.execute("RELEASE write")
+            return False, e
+        cursor.execute("RELEASE write")
+        return True, value
+
+    def _loop(self):
+        """Take queued writes in batches and commit each batch as one transaction"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in batch
+            batch = [entry for entry in batch
+                     if entry is not _STOP and entry[0].set_running_or_notify_cancel()]
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: list):
+        """Apply a batch of writes and resolve their futures after the commit"""
+        conn = None
+        results = []
+        try:
+            conn = get_connection()
+            self._cursor = conn.cursor()
+            self._cursor.execute("BEGIN IMMEDIATE")
+            for _, fn, args in batch:
+                results.append(self._apply(self._cursor, fn, args))
+            conn.commit()
+        except BaseException as e:
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            for future, _, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            if self._cursor is not None:
+                self._cursor.close()
+                self._cursor = None
+
+        for (future, _, _), (ok, value) in zip(batch, results):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+writer = Writer()
+atexit.register(writer.shutdown)
@@ -7,8 +7,12 @@ from datetime import date, timedelta
 import random
 from database.db import init_db, get_connection
 from database.models import Company, Product, Customer, Invoice, Category
+from database.writer import writer
 from services.invoice_service import InvoiceService
 
+# Fixed seed so every run builds the same demo data
+DEMO_SEED = 42
+
 def create_demo_data():
     """Create sample data for demo"""
 
@@ -18,7 +22,9 @@ def create_demo_data():
     conn = get_connection()
 
     # Clear existing data (except structure)
-    tables = ['invoice_items', 'invoices', 'credit_notes', 'credit_note_items',
+    # invoice_counters goes too, so document numbers start again from 0001
+    tables = ['email_queue', 'invoice_items', 'invoices', 'credit_note_items', 'credit_notes',
+              'quotation_items', 'quotations', 'invoice_counters',
               'invoice_payments', 'stock_log', 'held_bills', 'products', 'customers', 'company', 'categories']
     for table in tables:
         try:
@@ -26,10 +32,23 @@ def create_demo_data():
         except Exception as e:
             print(f"  Note: Could not clear {table}: {e}")
     conn.commit()
-    conn.close()
 
     print("Creating demo data...")
 
+    # Every save below runs inside this one write, so they share a single
+    # transaction and commit instead of committing once per record
+    writer.run(_create_records)
+    # Refresh planner statistics for the freshly loaded tables
+    writer.execute("ANALYZE")
+
+    print("\nDemo database created successfully!")
+    print(f"Location: {os.path.abspath('data/billing.db')}")
+
+
+def _create_records(cursor):
+    """Create the sample records; runs on the writer thread"""
+    rng = random.Random(DEMO_SEED)
+
     # 1. Company Details
     company = Company(
         name="COSMIC RETAIL STORE",
@@ -102,7 +121,7 @@ def create_demo_data():
 
     products = []
     for name, hsn, price, gst, cat_name, unit, stock in products_data:
-        barcode = f"89{random.randint(10000000000, 99999999999)}"
+        barcode = f"89{rng.randint(10000000000, 99999999999)}"
         p = Product(
             name=name,
             barcode=barcode,
@@ -150,52 +169,44 @@ def create_demo_data():
 
     # Generate invoices for the last 30 days
     today = date.today()
-    invoice_count = 0
-
-    for days_ago in range(30, -1, -1):
+    orders = []
+
+    # Draw the per-invoice choices up front, one choices() call per column
+    # 2-5 invoices per day
+    invoices_per_day = rng.choices(range(2, 6), k=31)
+    total_invoices = sum(invoices_per_day)
+    # Random customer (or None for cash), 3/11 chance of cash customer
+    order_customers = rng.choices(customers + [None, None, None], k=total_invoices)
+    # Random 1-5 products
+    item_counts = rng.choices(range(1, 6), k=total_invoices)
+    # Random discount (0-10% of orders have discount)
+    discounts = rng.choices([0, 0, 0, 0, 0, 0, 0, 0, 0, 50, 100, 200], k=total_invoices)
+    # Random payment mode
+    payment_modes = rng.choices(["CASH", "CASH", "CASH", "UPI", "UPI", "CARD"], k=total_invoices)
+
+    i = 0
+    for days_ago, num_invoices in zip(range(30, -1, -1), invoices_per_day):
         invoice_date = today - timedelta(days=days_ago)
 
-        # 2-5 invoices per day
-        num_invoices = random.randint(2, 5)
-
         for _ in range(num_invoices):
-            # Random customer (or None for cash)
-            customer = random.choice(customers + [None, None, None])  # 3/11 chance of cash customer
-
-            # Random 1-5 products
-            num_items = random.randint(1, 5)
-            cart_items = []
-            selected_products = random.sample(products, min(num_items, len(products)))
-
-            for product in selected_products:
-                qty = random.randint(1, 3)
-                cart_items.append({
-                    'product_id': product.id,
-                    'qty': qty
-                })
-
-            # Random discount (0-10% of orders have discount)
-            discount = random.choice([0, 0, 0, 0, 0, 0, 0, 0, 0, 50, 100, 200])
-
-            # Random payment mode
-            payment_mode = random.choice(["CASH", "CASH", "CASH", "UPI", "UPI", "CARD"])
-
-            try:
-                invoice = invoice_service.create_invoice(
-                    cart_items=cart_items,
-                    customer=customer,
-                    discount=discount,
-                    payment_mode=payment_mode,
-                    invoice_date=invoice_date
-                )
-                invoice_count += 1
-            except Exception as e:
-                print(f"  Warning: Could not create invoice: {e}")
-
-    print(f"- {invoice_count} invoices created")
-
-    print("\nDemo database created successfully!")
-    print(f"Location: {os.path.abspath('data/billing.db')}")
+            num_items = min(item_counts[i], len(products))
+            selected_products = rng.sample(products, num_items)
+            quantities = rng.choices(range(1, 4), k=num_items)
+            cart_items = [{'product_id': product.id, 'qty': qty}
+                          for product, qty in zip(selected_products, quantities)]
+
+            orders.append({
+                'cart_items': cart_items,
+                'customer': order_customers[i],
+                'discount': discounts[i],
+                'payment_mode': payment_modes[i],
+                'invoice_date': invoice_date
+            })
+            i += 1
+
+    # All invoices go in together, with one stock update for the lot
+    invoices = invoice_service.create_invoices(orders)
+    print(f"- {len(invoices)} invoices created")
 
 if __name__ == "__main__":
     create_demo_data()
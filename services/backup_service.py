@@ -1,42 +1,177 @@
 """Backup service for Google Drive sync and local backups"""
+import errno
+import functools
 import os
 import shutil
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
 from pathlib import Path
-from config import DB_PATH, BACKUP_DIR, DATA_DIR
+from typing import Optional
+from config import DB_PATH, DATA_DIR, backup_dir
+from database.db import close_connections, get_connection
+from database.models import clear_caches
+
+BACKUP_INFO_SQL = """
+    SELECT (SELECT COUNT(*) FROM invoices),
+           (SELECT COUNT(*) FROM products),
+           (SELECT COUNT(*) FROM customers),
+           (SELECT MIN(invoice_date) FROM invoices),
+           (SELECT MAX(invoice_date) FROM invoices),
+           (SELECT name FROM company LIMIT 1)
+"""
+
+# Seconds a resolved backup directory is trusted before it is looked up again
+BACKUP_DIR_TTL = 30
+
+# Threads reading backup headers in parallel when listing a folder
+HEADER_CHECK_WORKERS = 8
+
+
+@functools.cache
+def _google_drive_paths() -> tuple:
+    """Folders Google Drive may sync from (resolved on first use)"""
+    home = Path.home()
+    return (
+        home / "Google Drive",
+        home / "GoogleDrive",
+        Path("G:/My Drive"),  # Google Drive desktop app
+        home / "My Drive",
+    )
 
 
 class BackupService:
     """Service for database backup to Google Drive and local folders"""
 
     # Required tables for validation
-    REQUIRED_TABLES = ['company', 'products', 'customers', 'invoices', 'invoice_items']
+    REQUIRED_TABLES = frozenset({'company', 'products', 'customers', 'invoices', 'invoice_items'})
+
+    # Backup directory found by the last setup_backup_directory(), shared by all instances
+    _resolved_dir: Optional[Path] = None
+    _resolved_at: float = 0.0
+
+    # Header checks overlap their file reads on one pool kept across listings
+    _header_pool: Optional[ThreadPoolExecutor] = None
+    _header_pool_lock = threading.Lock()
+
+    @classmethod
+    def _get_header_pool(cls) -> ThreadPoolExecutor:
+        """Create the shared header-check pool on first use"""
+        with cls._header_pool_lock:
+            if cls._header_pool is None:
+                cls._header_pool = ThreadPoolExecutor(max_workers=HEADER_CHECK_WORKERS,
+                                                      thread_name_prefix="backup-header")
+            return cls._header_pool
 
     def __init__(self):
-        self.backup_dir = BACKUP_DIR
+        self.backup_dir = backup_dir()
         self.db_path = DB_PATH
         self.local_backup_dir = DATA_DIR / "local_backups"
 
+    @staticmethod
+    def _fast_copy(src: Path, dst: Path):
+        """Copy src to dst inside the kernel where possible, keeping mode and times like copy2"""
+        copy_file_range = getattr(os, 'copy_file_range', None)
+        if copy_file_range is None:
+            # Not Linux; copy2 already uses the platform's fast copy call
+            shutil.copy2(src, dst)
+            return
+
+        src_fd = os.open(src, os.O_RDONLY)
+        try:
+            size = os.fstat(src_fd).st_size
+            dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                done = 0
+                try:
+                    # Lets the filesystem reflink or copy server-side, with no userspace buffer
+                    while done < size:
+                        sent = copy_file_range(src_fd, dst_fd, size - done, done, done)
+                        if sent == 0:
+                            break
+                        done += sent
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                        raise
+                    # Older kernels and cross-device copies: sendfile still stays in the kernel
+                    os.lseek(dst_fd, done, os.SEEK_SET)
+                    while done < size:
+                        sent = os.sendfile(dst_fd, src_fd, done, size - done)
+                        if sent == 0:
+                            break
+                        done += sent
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+        shutil.copystat(src, dst)
+
+    def _snapshot_to(self, backup_file: Path):
+        """Write a consistent copy of the live database to backup_file with the online backup API"""
+        # Built beside the target and moved into place, so a failed backup
+        # never replaces the previous one
+        tmp_file = backup_file.with_name(backup_file.name + ".tmp")
+        tmp_file.unlink(missing_ok=True)
+        src = sqlite3.connect(self.db_path.resolve().as_uri() + "?mode=ro", uri=True)
+        try:
+            dst = sqlite3.connect(str(tmp_file))
+            try:
+                # 1024 pages per step, releasing the read lock in between
+                src.backup(dst, pages=1024)
+                # A backup is a single self-contained file, not a WAL database
+                dst.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                dst.close()
+        finally:
+            src.close()
+        os.replace(tmp_file, backup_file)
+
+    @staticmethod
+    def _scan_db_files(directory: Path, prefix: str = ""):
+        """Yield (entry, stat) for each prefix*.db file in directory, with one stat per file"""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith(prefix) and name.endswith(".db") and entry.is_file():
+                        yield entry, entry.stat()
+        except FileNotFoundError:
+            return
+
+    def _backup_stats(self, directory: Path) -> tuple:
+        """Count and total size of the billing_*.db backups in directory, in one pass"""
+        count = 0
+        total_size = 0
+        for _, st in self._scan_db_files(directory, "billing_"):
+            count += 1
+            total_size += st.st_size
+        return count, total_size
+
+    @staticmethod
+    def _newest_first(backups: list) -> list:
+        """Sort backup dicts by their raw 'modified' mtime, newest first, then make it a datetime"""
+        backups.sort(key=itemgetter('modified'), reverse=True)
+        for backup in backups:
+            backup['modified'] = datetime.fromtimestamp(backup['modified'])
+        return backups
+
     def setup_backup_directory(self) -> bool:
         """
         Set up the backup directory structure
 
         Returns True if Google Drive folder exists and is accessible
         """
+        cls = type(self)
+        if cls._resolved_dir is not None and time.monotonic() - cls._resolved_at < BACKUP_DIR_TTL:
+            self.backup_dir = cls._resolved_dir
+            return True
+
         try:
-            # Check if Google Drive folder exists
-            google_drive_base = Path.home() / "Google Drive"
-
-            # Also check for "Google Drive" in common locations on Windows
-            possible_paths = [
-                Path.home() / "Google Drive",
-                Path.home() / "GoogleDrive",
-                Path("G:/My Drive"),  # Google Drive desktop app
-                Path.home() / "My Drive",
-            ]
-
-            for path in possible_paths:
+            # Check if Google Drive folder exists, also in common locations on Windows
+            for path in _google_drive_paths():
                 if path.exists():
                     self.backup_dir = path / "Billing Backup"
                     break
@@ -45,6 +180,8 @@ class BackupService:
             self.backup_dir.mkdir(parents=True, exist_ok=True)
             (self.backup_dir / "backups").mkdir(exist_ok=True)
 
+            cls._resolved_dir = self.backup_dir
+            cls._resolved_at = time.monotonic()
             return True
         except Exception as e:
             print(f"Backup setup error: {e}")
@@ -74,11 +211,11 @@ class BackupService:
             if manual:
                 # Create timestamped backup
                 backup_file = self.backup_dir / "backups" / f"billing_{timestamp}.db"
-                shutil.copy2(self.db_path, backup_file)
+                self._snapshot_to(backup_file)
             else:
                 # Copy to main sync location
                 backup_file = self.backup_dir / "billing.db"
-                shutil.copy2(self.db_path, backup_file)
+                self._snapshot_to(backup_file)
 
             return {
                 'success': True,
@@ -96,23 +233,17 @@ class BackupService:
     def get_backup_list(self) -> list:
         """Get list of available backups"""
         try:
-            backups_dir = self.backup_dir / "backups"
-            if not backups_dir.exists():
-                return []
-
             backups = []
-            for f in backups_dir.glob("billing_*.db"):
+            for entry, st in self._scan_db_files(self.backup_dir / "backups", "billing_"):
                 backups.append({
-                    'filename': f.name,
-                    'path': str(f),
-                    'size': f.stat().st_size,
-                    'modified': datetime.fromtimestamp(f.stat().st_mtime)
+                    'filename': entry.name,
+                    'path': entry.path,
+                    'size': st.st_size,
+                    'modified': st.st_mtime
                 })
 
             # Sort by date, newest first
-            backups.sort(key=lambda x: x['modified'], reverse=True)
-
-            return backups
+            return self._newest_first(backups)
 
         except Exception as e:
             print(f"Error listing backups: {e}")
@@ -140,10 +271,16 @@ class BackupService:
             # Create backup of current database before restore
             if self.db_path.exists():
                 current_backup = DATA_DIR / f"billing_before_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-                shutil.copy2(self.db_path, current_backup)
+                self._snapshot_to(current_backup)
+
+            # Release open handles so the restored file is not mixed with the old WAL
+            close_connections()
+            clear_caches()
 
             # Restore
-            shutil.copy2(backup_file, self.db_path)
+            self._fast_copy(backup_file, self.db_path)
+            # Backups are rollback-journal files; the next connection switches back to WAL
+            get_connection()
 
             return {
                 'success': True,
@@ -164,16 +301,12 @@ class BackupService:
             keep_days: Number of days to keep backups
         """
         try:
-            backups_dir = self.backup_dir / "backups"
-            if not backups_dir.exists():
-                return
-
             cutoff = datetime.now().timestamp() - (keep_days * 24 * 60 * 60)
 
-            for f in backups_dir.glob("billing_*.db"):
-                if f.stat().st_mtime < cutoff:
-                    f.unlink()
-                    print(f"Deleted old backup: {f.name}")
+            for entry, st in self._scan_db_files(self.backup_dir / "backups", "billing_"):
+                if st.st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    print(f"Deleted old backup: {entry.name}")
 
         except Exception as e:
             print(f"Cleanup error: {e}")
@@ -185,19 +318,19 @@ class BackupService:
             google_drive_available = self.setup_backup_directory()
 
             # Check last backup time
-            main_backup = self.backup_dir / "billing.db"
-            last_backup = None
-            if main_backup.exists():
-                last_backup = datetime.fromtimestamp(main_backup.stat().st_mtime)
+            try:
+                last_backup = datetime.fromtimestamp((self.backup_dir / "billing.db").stat().st_mtime)
+            except FileNotFoundError:
+                last_backup = None
 
-            backups = self.get_backup_list()
+            backup_count, total_size = self._backup_stats(self.backup_dir / "backups")
 
             return {
                 'google_drive_available': google_drive_available,
                 'backup_dir': str(self.backup_dir),
                 'last_backup': last_backup,
-                'backup_count': len(backups),
-                'total_size': sum(b['size'] for b in backups)
+                'backup_count': backup_count,
+                'total_size': total_size
             }
 
         except Exception as e:
@@ -236,7 +369,7 @@ class BackupService:
             backup_file = backup_dir / f"billing_{timestamp}.db"
 
             # Copy database
-            shutil.copy2(self.db_path, backup_file)
+            self._snapshot_to(backup_file)
 
             return {
                 'success': True,
@@ -267,35 +400,103 @@ class BackupService:
             else:
                 search_dir = self.local_backup_dir
 
-            if not search_dir.exists():
-                return []
+            files = list(self._scan_db_files(search_dir))
+            # Only the header is checked here; the full check runs on restore
+            validations = self._get_header_pool().map(
+                self._validate_header, [entry.path for entry, _ in files], [st.st_size for _, st in files])
 
             backups = []
-            for f in search_dir.glob("*.db"):
-                # Validate it's a SQLite file
-                validation = self.validate_backup(str(f))
+            for (entry, st), validation in zip(files, validations):
                 backups.append({
-                    'filename': f.name,
-                    'path': str(f),
-                    'size': f.stat().st_size,
-                    'modified': datetime.fromtimestamp(f.stat().st_mtime),
+                    'filename': entry.name,
+                    'path': entry.path,
+                    'size': st.st_size,
+                    'modified': st.st_mtime,
                     'valid': validation['valid'],
-                    'validation_message': validation.get('message', '')
+                    'validation_message': validation.get('message', ''),
+                    'validation_level': 'header'
                 })
 
-            backups.sort(key=lambda x: x['modified'], reverse=True)
-            return backups
+            return self._newest_first(backups)
 
         except Exception as e:
             print(f"Error listing local backups: {e}")
             return []
 
-    def validate_backup(self, backup_path: str) -> dict:
+    @staticmethod
+    def _open_read_only(backup_file: Path) -> sqlite3.Connection:
+        """Open a backup file for reading without locking it or touching its journal"""
+        return sqlite3.connect(f"{backup_file.resolve().as_uri()}?mode=ro&immutable=1", uri=True)
+
+    @staticmethod
+    def _validate_header(backup_path: str, size: int) -> dict:
+        """Cheap check of a backup's size and SQLite magic bytes, without opening it as a database"""
+        # Check file size
+        if size < 1000:
+            return {
+                'valid': False,
+                'message': 'File too small to be valid database'
+            }
+
+        # Check SQLite magic bytes
+        try:
+            with open(backup_path, 'rb') as f:
+                header = f.read(16)
+        except OSError as e:
+            return {
+                'valid': False,
+                'message': f'Cannot read file: {e}'
+            }
+        if not header.startswith(b'SQLite format 3'):
+            return {
+                'valid': False,
+                'message': 'Not a valid SQLite database file'
+            }
+
+        return {
+            'valid': True,
+            'message': 'SQLite header is valid'
+        }
+
+    def _check_database(self, conn: sqlite3.Connection) -> dict:
+        """Check an open backup for the required tables and structural damage"""
+        cursor = conn.cursor()
+
+        # Get list of tables
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        tables = [row[0] for row in cursor.fetchall()]
+
+        # Check for required tables
+        missing_tables = self.REQUIRED_TABLES.difference(tables)
+        if missing_tables:
+            return {
+                'valid': False,
+                'message': f'Missing tables: {", ".join(sorted(missing_tables))}'
+            }
+
+        # Structural check, stopping at the first error; unlike
+        # integrity_check it skips matching every index to its table
+        cursor.execute("PRAGMA quick_check(1)")
+        integrity = cursor.fetchone()[0]
+        if integrity != 'ok':
+            return {
+                'valid': False,
+                'message': f'Database integrity check failed: {integrity}'
+            }
+
+        return {
+            'valid': True,
+            'message': 'Backup is valid',
+            'tables': tables
+        }
+
+    def validate_backup(self, backup_path: str, conn: Optional[sqlite3.Connection] = None) -> dict:
         """
         Validate backup file integrity before restore
 
         Args:
             backup_path: Path to backup file
+            conn: Read-only connection already open on the file; one is opened if None
 
         Returns:
             dict with validation result and details
@@ -309,57 +510,19 @@ class BackupService:
                     'message': 'File not found'
                 }
 
-            # Check file size
-            if backup_file.stat().st_size < 1000:
-                return {
-                    'valid': False,
-                    'message': 'File too small to be valid database'
-                }
-
-            # Check SQLite magic bytes
-            with open(backup_file, 'rb') as f:
-                header = f.read(16)
-                if not header.startswith(b'SQLite format 3'):
-                    return {
-                        'valid': False,
-                        'message': 'Not a valid SQLite database file'
-                    }
+            header = self._validate_header(backup_path, backup_file.stat().st_size)
+            if not header['valid']:
+                return header
 
             # Try to open and verify tables
             try:
-                conn = sqlite3.connect(str(backup_file))
-                cursor = conn.cursor()
-
-                # Get list of tables
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                tables = [row[0] for row in cursor.fetchall()]
-
-                # Check for required tables
-                missing_tables = [t for t in self.REQUIRED_TABLES if t not in tables]
-                if missing_tables:
-                    conn.close()
-                    return {
-                        'valid': False,
-                        'message': f'Missing tables: {", ".join(missing_tables)}'
-                    }
-
-                # Run integrity check
-                cursor.execute("PRAGMA integrity_check")
-                integrity = cursor.fetchone()[0]
-                if integrity != 'ok':
+                if conn is not None:
+                    return self._check_database(conn)
+                conn = self._open_read_only(backup_file)
+                try:
+                    return self._check_database(conn)
+                finally:
                     conn.close()
-                    return {
-                        'valid': False,
-                        'message': f'Database integrity check failed: {integrity}'
-                    }
-
-                conn.close()
-
-                return {
-                    'valid': True,
-                    'message': 'Backup is valid',
-                    'tables': tables
-                }
 
             except sqlite3.Error as e:
                 return {
@@ -373,12 +536,13 @@ class BackupService:
                 'message': f'Validation error: {e}'
             }
 
-    def get_backup_info(self, backup_path: str) -> dict:
+    def get_backup_info(self, backup_path: str, conn: Optional[sqlite3.Connection] = None) -> dict:
         """
         Get detailed information about a backup file
 
         Args:
             backup_path: Path to backup file
+            conn: Read-only connection already open on the file; one is opened if None
 
         Returns:
             dict with backup details (invoice count, date range, etc.)
@@ -389,49 +553,39 @@ class BackupService:
             if not backup_file.exists():
                 return {'error': 'File not found'}
 
-            # Validate first
-            validation = self.validate_backup(backup_path)
-            if not validation['valid']:
-                return {'error': validation['message']}
-
-            # Get counts and info
-            conn = sqlite3.connect(str(backup_file))
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            info = {
-                'filename': backup_file.name,
-                'path': str(backup_file),
-                'size': backup_file.stat().st_size,
-                'modified': datetime.fromtimestamp(backup_file.stat().st_mtime),
-                'valid': True
-            }
-
-            # Count records
-            cursor.execute("SELECT COUNT(*) FROM invoices")
-            info['invoice_count'] = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM products")
-            info['product_count'] = cursor.fetchone()[0]
-
-            cursor.execute("SELECT COUNT(*) FROM customers")
-            info['customer_count'] = cursor.fetchone()[0]
-
-            # Get date range of invoices
-            cursor.execute("SELECT MIN(invoice_date), MAX(invoice_date) FROM invoices")
-            row = cursor.fetchone()
-            if row and row[0]:
-                info['first_invoice_date'] = row[0]
-                info['last_invoice_date'] = row[1]
-
-            # Get company name
-            cursor.execute("SELECT name FROM company LIMIT 1")
-            row = cursor.fetchone()
-            if row:
-                info['company_name'] = row[0]
+            # Validation and the summary below share one read-only connection
+            own_conn = conn is None
+            if own_conn:
+                conn = self._open_read_only(backup_file)
+            try:
+                # Validate first
+                validation = self.validate_backup(backup_path, conn)
+                if not validation['valid']:
+                    return {'error': validation['message']}
+
+                # Get counts and info
+                st = backup_file.stat()
+                info = {
+                    'filename': backup_file.name,
+                    'path': str(backup_file),
+                    'size': st.st_size,
+                    'modified': datetime.fromtimestamp(st.st_mtime),
+                    'valid': True
+                }
 
-            conn.close()
-            return info
+                # Record counts, invoice date range and company name in one query
+                (info['invoice_count'], info['product_count'], info['customer_count'],
+                 first_date, last_date, company_name) = conn.execute(BACKUP_INFO_SQL).fetchone()
+                if first_date:
+                    info['first_invoice_date'] = first_date
+                    info['last_invoice_date'] = last_date
+                if company_name is not None:
+                    info['company_name'] = company_name
+
+                return info
+            finally:
+                if own_conn:
+                    conn.close()
 
         except Exception as e:
             return {'error': str(e)}
@@ -446,16 +600,13 @@ class BackupService:
         Returns:
             dict with status and details
         """
-        # Validate first
-        validation = self.validate_backup(backup_path)
-        if not validation['valid']:
+        # get_backup_info validates first, on the same connection it reads the summary with
+        info = self.get_backup_info(backup_path)
+        if 'error' in info:
             return {
                 'success': False,
-                'error': f'Invalid backup: {validation["message"]}'
+                'error': f'Invalid backup: {info["error"]}'
             }
 
-        # Get backup info for confirmation
-        info = self.get_backup_info(backup_path)
-
         # Proceed with restore
         return self.restore_backup(backup_path)
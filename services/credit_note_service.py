@@ -146,11 +146,10 @@ class CreditNoteService:
         from database.db import get_connection
         conn = get_connection()
         rows = conn.execute("""
-            SELECT * FROM credit_notes
+            SELECT id FROM credit_notes
             WHERE customer_id = ? AND status != 'CANCELLED'
             ORDER BY credit_note_date DESC
         """, (customer_id,)).fetchall()
-        conn.close()
         return [CreditNote.get_by_id(row['id']) for row in rows]
 
     def get_credit_note_summary(self, start_date: date, end_date: date) -> Dict:
@@ -200,11 +199,10 @@ class CreditNoteService:
 
         # Reverse stock if requested
         if reverse_stock:
-            for item in credit_note.items:
-                if item.product_id:
-                    product = Product.get_by_id(item.product_id)
-                    if product:
-                        product.update_stock(-item.qty, "CN_CANCELLED", credit_note.id)
+            Product.bulk_update_stock([
+                (item.product_id, -item.qty, "CN_CANCELLED", credit_note.id)
+                for item in credit_note.items if item.product_id
+            ])
 
         credit_note.cancel()
         return True
@@ -2,6 +2,7 @@
 import threading
 import time
 from typing import Optional, Callable, Dict, Any
+from database.db import close_connection
 from services.email_queue_service import EmailQueueService
 from services.network_service import NetworkService
 
@@ -52,7 +53,7 @@ class EmailQueueProcessor:
                 return
 
             self._running = True
-            self._thread = threading.Thread(target=self._process_loop, daemon=True)
+            self._thread = threading.Thread(target=self._run, daemon=True)
             self._thread.start()
 
     def stop(self):
@@ -89,6 +90,13 @@ class EmailQueueProcessor:
         """Set the interval between queue checks"""
         self._check_interval = max(10, seconds)  # Minimum 10 seconds
 
+    def _run(self):
+        """Thread entry point; releases the thread's database connection on exit"""
+        try:
+            self._process_loop()
+        finally:
+            close_connection()
+
     def _process_loop(self):
         """Main background processing loop"""
         while True:
@@ -1,7 +1,8 @@
 """Email queue management service for offline support"""
 from datetime import datetime
 from typing import List, Dict, Optional
-from database.db import get_connection
+from database.db import get_connection, read_blob
+from database.writer import writer
 from services.email_service import EmailService, get_email_setting
 from services.pdf_generator import PDFGenerator
 
@@ -47,41 +48,43 @@ class EmailQueueService:
         except Exception:
             pdf_bytes = None
 
-        # Insert into queue
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO email_queue (
-                invoice_id, recipient_email, subject, body, pdf_data, status
-            ) VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            invoice.id,
-            recipient,
-            email_content['subject'],
-            email_content['body_html'],
-            pdf_bytes,
-            STATUS_PENDING
-        ))
-
-        queue_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        return queue_id
+        # Insert into queue; on the writer thread, so it also works from inside another write
+        def write(cursor):
+            cursor.execute("""
+                INSERT INTO email_queue (
+                    invoice_id, recipient_email, subject, body, status
+                ) VALUES (?, ?, ?, ?, ?)
+            """, (
+                invoice.id,
+                recipient,
+                email_content['subject'],
+                email_content['body_html'],
+                STATUS_PENDING
+            ))
+
+            queue_id = cursor.lastrowid
+            if pdf_bytes is not None:
+                cursor.execute(
+                    "INSERT INTO email_queue_pdfs (entry_id, pdf_data) VALUES (?, ?)",
+                    (queue_id, pdf_bytes)
+                )
+            return queue_id
+
+        return writer.run(write)
 
     def get_pending_emails(self) -> List[Dict]:
         """
         Get all emails that are pending or ready for retry.
 
         Returns:
-            List of queue entries as dictionaries
+            List of queue entries as dictionaries (without the PDF attachment)
         """
         conn = get_connection()
         cursor = conn.cursor()
 
+        # The attachment lives in email_queue_pdfs and is only read when an entry is sent
         cursor.execute("""
-            SELECT id, invoice_id, recipient_email, subject, body, pdf_data,
+            SELECT id, invoice_id, recipient_email, subject, body,
                    status, retry_count, error_message, created_at
             FROM email_queue
             WHERE status = ? OR (status = ? AND retry_count < ?)
@@ -89,7 +92,6 @@ class EmailQueueService:
         """, (STATUS_PENDING, STATUS_FAILED, MAX_RETRIES))
 
         rows = cursor.fetchall()
-        conn.close()
 
         return [dict(row) for row in rows]
 
@@ -108,18 +110,20 @@ class EmailQueueService:
         cursor = conn.cursor()
 
         cursor.execute("""
-            SELECT id, invoice_id, recipient_email, subject, body, pdf_data,
-                   status, retry_count
+            SELECT invoice_id, recipient_email, subject, body,
+                   EXISTS(SELECT 1 FROM email_queue_pdfs WHERE entry_id = email_queue.id) AS has_pdf
             FROM email_queue WHERE id = ?
         """, (queue_id,))
 
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
+        # The sqlite3.Row is used as-is; only the columns the send needs are selected
+        entry = cursor.fetchone()
+        if not entry:
             return False
 
-        entry = dict(row)
-        conn.close()
+        # Stream the attachment through the incremental BLOB API where available
+        pdf_data = None
+        if entry['has_pdf']:
+            pdf_data = read_blob(conn, 'email_queue_pdfs', 'pdf_data', queue_id)
 
         # Mark as sending
         self._update_status(queue_id, STATUS_SENDING)
@@ -139,7 +143,7 @@ class EmailQueueService:
             subject=entry['subject'],
             body_html=entry['body'],
             body_text=body_text,
-            pdf_bytes=entry['pdf_data'],
+            pdf_bytes=pdf_data,
             pdf_name=pdf_name
         )
 
@@ -195,18 +199,12 @@ class EmailQueueService:
 
     def mark_as_sent(self, queue_id: int):
         """Mark a queue entry as successfully sent"""
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
+        writer.execute("""
             UPDATE email_queue
             SET status = ?, sent_at = ?, error_message = NULL
             WHERE id = ?
         """, (STATUS_SENT, datetime.now(), queue_id))
 
-        conn.commit()
-        conn.close()
-
     def mark_as_failed(self, queue_id: int, error_message: str):
         """
         Mark a queue entry as failed and increment retry count.
@@ -215,43 +213,19 @@ class EmailQueueService:
             queue_id: Queue entry ID
             error_message: Error description
         """
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        # Get current retry count
-        cursor.execute("SELECT retry_count FROM email_queue WHERE id = ?", (queue_id,))
-        row = cursor.fetchone()
-        if not row:
-            conn.close()
-            return
-
-        new_retry_count = row['retry_count'] + 1
-
-        # Determine new status
-        if new_retry_count >= MAX_RETRIES:
-            new_status = STATUS_FAILED
-        else:
-            new_status = STATUS_FAILED  # Will be retried on next process cycle
-
-        cursor.execute("""
+        # FAILED either way; entries under MAX_RETRIES are retried on the next process cycle
+        writer.execute("""
             UPDATE email_queue
-            SET status = ?, retry_count = ?, error_message = ?
+            SET status = ?, retry_count = retry_count + 1, error_message = ?
             WHERE id = ?
-        """, (new_status, new_retry_count, error_message, queue_id))
-
-        conn.commit()
-        conn.close()
+        """, (STATUS_FAILED, error_message, queue_id))
 
     def _update_status(self, queue_id: int, status: str):
         """Update queue entry status"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
+        writer.execute(
             "UPDATE email_queue SET status = ? WHERE id = ?",
             (status, queue_id)
         )
-        conn.commit()
-        conn.close()
 
     def get_queue_status(self) -> Dict:
         """
@@ -270,7 +244,6 @@ class EmailQueueService:
         """)
 
         rows = cursor.fetchall()
-        conn.close()
 
         result = {'pending': 0, 'failed': 0, 'sent': 0}
 
@@ -298,7 +271,6 @@ class EmailQueueService:
         """, (STATUS_PENDING, STATUS_FAILED, MAX_RETRIES))
 
         row = cursor.fetchone()
-        conn.close()
 
         return row['count'] if row else 0
 
@@ -313,7 +285,6 @@ class EmailQueueService:
         """, (STATUS_FAILED, MAX_RETRIES))
 
         row = cursor.fetchone()
-        conn.close()
 
         return row['count'] if row else 0
 
@@ -328,28 +299,18 @@ class EmailQueueService:
             True if email was sent successfully
         """
         # Reset retry count and status
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
+        writer.execute("""
             UPDATE email_queue
             SET status = ?, retry_count = 0, error_message = NULL
             WHERE id = ?
         """, (STATUS_PENDING, queue_id))
 
-        conn.commit()
-        conn.close()
-
         # Process immediately
         return self.process_single_email(queue_id)
 
     def delete_from_queue(self, queue_id: int):
         """Remove an entry from the queue"""
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM email_queue WHERE id = ?", (queue_id,))
-        conn.commit()
-        conn.close()
+        writer.execute("DELETE FROM email_queue WHERE id = ?", (queue_id,))
 
     def get_queue_entries(self, limit: int = 50) -> List[Dict]:
         """
@@ -376,6 +337,5 @@ class EmailQueueService:
         """, (limit,))
 
         rows = cursor.fetchall()
-        conn.close()
 
         return [dict(row) for row in rows]
@@ -4,8 +4,7 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 from typing import Tuple, Dict, Optional
-from database.db import get_connection
-from database.models import Company
+from database.models import AppSettings, Company
 
 
 class EmailService:
@@ -22,27 +21,14 @@ class EmailService:
 
     def _load_settings(self):
         """Load email settings from app_settings table"""
-        conn = get_connection()
-        cursor = conn.cursor()
-
-        settings_keys = [
-            'email_sender_address',
-            'email_app_password',
-            'email_recipient',
-        ]
-
-        for key in settings_keys:
-            cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
-            row = cursor.fetchone()
-            if row:
-                if key == 'email_sender_address':
-                    self.sender_email = row['value']
-                elif key == 'email_app_password':
-                    self.app_password = row['value']
-                elif key == 'email_recipient':
-                    self.recipient_email = row['value']
-
-        conn.close()
+        settings = AppSettings.get_all()
+
+        if 'email_sender_address' in settings:
+            self.sender_email = settings['email_sender_address']
+        if 'email_app_password' in settings:
+            self.app_password = settings['email_app_password']
+        if 'email_recipient' in settings:
+            self.recipient_email = settings['email_recipient']
 
     def reload_settings(self):
         """Reload settings from database"""
@@ -291,13 +277,7 @@ def get_email_setting(key: str, default: str = "") -> str:
     Returns:
         Setting value or default
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
-    row = cursor.fetchone()
-    conn.close()
-
-    return row['value'] if row else default
+    return AppSettings.get(key, default)
 
 
 def set_email_setting(key: str, value: str):
@@ -308,14 +288,7 @@ def set_email_setting(key: str, value: str):
         key: Setting key name
         value: Setting value
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)",
-        (key, value)
-    )
-    conn.commit()
-    conn.close()
+    AppSettings.set(key, value)
 
 
 def is_email_auto_send_enabled() -> bool:
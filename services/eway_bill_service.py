@@ -343,15 +343,12 @@ class EWayBillService:
 
     def save_eway_bill_number(self, invoice_id: int, eway_bill_number: str) -> bool:
         """Save e-Way Bill number to invoice after manual portal entry"""
-        from database.db import get_connection
+        from database.writer import writer
         try:
-            conn = get_connection()
-            conn.execute(
+            writer.execute(
                 "UPDATE invoices SET eway_bill_number = ? WHERE id = ?",
                 (eway_bill_number, invoice_id)
             )
-            conn.commit()
-            conn.close()
             return True
         except Exception as e:
             print(f"Error saving e-Way Bill number: {e}")
@@ -125,44 +125,19 @@ class GSTR1Exporter:
 
         Returns summary with section-wise totals
         """
-        invoices = Invoice.get_by_date_range(start_date, end_date)
-
-        total_invoices = 0
-        total_taxable = 0
-        total_cgst = 0
-        total_sgst = 0
-        total_igst = 0
-        total_value = 0
+        (total_invoices, total_taxable, total_cgst, total_sgst, total_igst,
+         total_value) = Invoice.sum_tax_by_date_range(start_date, end_date)
 
         # Rate-wise summary
         rate_summary = {}
-
-        for inv in invoices:
-            if inv.is_cancelled:
-                continue
-
-            total_invoices += 1
-            total_taxable += inv.subtotal
-            total_cgst += inv.cgst_total
-            total_sgst += inv.sgst_total
-            total_igst += inv.igst_total
-            total_value += inv.grand_total
-
-            for item in inv.items:
-                rate = item.gst_rate
-                if rate not in rate_summary:
-                    rate_summary[rate] = {
-                        "taxable": 0,
-                        "cgst": 0,
-                        "sgst": 0,
-                        "igst": 0,
-                        "count": 0
-                    }
-                rate_summary[rate]["taxable"] += item.taxable_value
-                rate_summary[rate]["cgst"] += item.cgst
-                rate_summary[rate]["sgst"] += item.sgst
-                rate_summary[rate]["igst"] += item.igst
-                rate_summary[rate]["count"] += 1
+        for rate, count, taxable, cgst, sgst, igst in Invoice.sum_tax_by_rate(start_date, end_date):
+            rate_summary[rate] = {
+                "taxable": taxable,
+                "cgst": cgst,
+                "sgst": sgst,
+                "igst": igst,
+                "count": count
+            }
 
         return {
             "period": {
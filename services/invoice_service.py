@@ -2,6 +2,7 @@
 from datetime import date, timedelta
 from typing import List, Optional, Dict
 from database.models import Invoice, InvoiceItem, Product, Customer
+from database.writer import writer
 from .gst_calculator import GSTCalculator, CartItem
 
 
@@ -32,6 +33,55 @@ class InvoiceService:
         Returns:
             Created Invoice object
         """
+        invoice = self._build_invoice(cart_items, customer, discount, payment_mode, invoice_date)
+
+        # Save invoice
+        invoice.save()
+
+        # Deduct stock
+        Product.bulk_update_stock([
+            (item.product_id, -item.qty, "SALE", invoice.id) for item in invoice.items
+        ])
+
+        self._queue_email(invoice)
+        return invoice
+
+    def create_invoices(self, orders: List[dict]) -> List[Invoice]:
+        """
+        Create several invoices in one transaction with a single stock update
+
+        Args:
+            orders: List of dicts holding create_invoice() arguments
+
+        Returns:
+            Created Invoice objects
+        """
+        def write(cursor):
+            invoices = []
+            for order in orders:
+                invoice = self._build_invoice(**order)
+                invoice.save()
+                invoices.append(invoice)
+            Product.bulk_update_stock([
+                (item.product_id, -item.qty, "SALE", invoice.id)
+                for invoice in invoices for item in invoice.items
+            ])
+            return invoices
+
+        invoices = writer.run(write)
+        for invoice in invoices:
+            self._queue_email(invoice)
+        return invoices
+
+    def _build_invoice(
+        self,
+        cart_items: List[dict],
+        customer: Optional[Customer] = None,
+        discount: float = 0,
+        payment_mode: str = "CASH",
+        invoice_date: date = None
+    ) -> Invoice:
+        """Build an unsaved invoice with GST worked out for the cart"""
         if invoice_date is None:
             invoice_date = date.today()
 
@@ -92,20 +142,10 @@ class InvoiceService:
                 total=item_detail['total']
             ))
 
-        # Save invoice
-        invoice.save()
-
-        # Deduct stock
-        for item_detail in calc_result['items']:
-            product = Product.get_by_id(item_detail['product_id'])
-            if product:
-                product.update_stock(
-                    qty_change=-item_detail['qty'],
-                    reason="SALE",
-                    reference_id=invoice.id
-                )
+        return invoice
 
-        # Queue email if auto-send is enabled
+    def _queue_email(self, invoice: Invoice):
+        """Queue the invoice email if auto-send is enabled"""
         try:
             from services.email_service import is_email_auto_send_enabled
             if is_email_auto_send_enabled():
@@ -116,8 +156,6 @@ class InvoiceService:
             # Don't fail invoice creation if email queue fails
             pass
 
-        return invoice
-
     def cancel_invoice(self, invoice_id: int) -> bool:
         """
         Cancel an invoice and restore stock
@@ -136,15 +174,10 @@ class InvoiceService:
         invoice.save()
 
         # Restore stock
-        for item in invoice.items:
-            if item.product_id:
-                product = Product.get_by_id(item.product_id)
-                if product:
-                    product.update_stock(
-                        qty_change=item.qty,  # Add back
-                        reason="CANCELLED",
-                        reference_id=invoice.id
-                    )
+        Product.bulk_update_stock([
+            (item.product_id, item.qty, "CANCELLED", invoice.id)
+            for item in invoice.items if item.product_id
+        ])
 
         return True
 
@@ -153,23 +186,16 @@ class InvoiceService:
         if sales_date is None:
             sales_date = date.today()
 
-        invoices = Invoice.get_by_date_range(sales_date, sales_date)
-
         total_sales = 0
         total_tax = 0
         invoice_count = 0
         payment_breakdown = {}
 
-        for inv in invoices:
-            if not inv.is_cancelled:
-                total_sales += inv.grand_total
-                total_tax += (inv.cgst_total + inv.sgst_total + inv.igst_total)
-                invoice_count += 1
-
-                mode = inv.payment_mode
-                if mode not in payment_breakdown:
-                    payment_breakdown[mode] = 0
-                payment_breakdown[mode] += inv.grand_total
+        for mode, count, sales, tax in Invoice.sum_by_date_range(sales_date, sales_date, "payment_mode"):
+            total_sales += sales
+            total_tax += tax
+            invoice_count += count
+            payment_breakdown[mode] = sales
 
         return {
             'date': sales_date,
@@ -181,17 +207,7 @@ class InvoiceService:
 
     def get_sales_by_date_range(self, start_date: date, end_date: date) -> dict:
         """Get sales summary for date range"""
-        invoices = Invoice.get_by_date_range(start_date, end_date)
-
-        total_sales = 0
-        total_tax = 0
-        invoice_count = 0
-
-        for inv in invoices:
-            if not inv.is_cancelled:
-                total_sales += inv.grand_total
-                total_tax += (inv.cgst_total + inv.sgst_total + inv.igst_total)
-                invoice_count += 1
+        _, invoice_count, total_sales, total_tax = Invoice.sum_by_date_range(start_date, end_date)[0]
 
         return {
             'start_date': start_date,
@@ -203,38 +219,18 @@ class InvoiceService:
 
     def get_gst_summary(self, start_date: date, end_date: date) -> dict:
         """Get GST summary for date range"""
-        invoices = Invoice.get_by_date_range(start_date, end_date)
-
-        total_taxable = 0
-        total_cgst = 0
-        total_sgst = 0
-        total_igst = 0
+        _, total_taxable, total_cgst, total_sgst, total_igst, _ = \
+            Invoice.sum_tax_by_date_range(start_date, end_date)
 
         # Group by GST rate
         rate_wise = {}
-
-        for inv in invoices:
-            if inv.is_cancelled:
-                continue
-
-            total_taxable += inv.subtotal
-            total_cgst += inv.cgst_total
-            total_sgst += inv.sgst_total
-            total_igst += inv.igst_total
-
-            for item in inv.items:
-                rate = item.gst_rate
-                if rate not in rate_wise:
-                    rate_wise[rate] = {
-                        'taxable': 0,
-                        'cgst': 0,
-                        'sgst': 0,
-                        'igst': 0
-                    }
-                rate_wise[rate]['taxable'] += item.taxable_value
-                rate_wise[rate]['cgst'] += item.cgst
-                rate_wise[rate]['sgst'] += item.sgst
-                rate_wise[rate]['igst'] += item.igst
+        for rate, _, taxable, cgst, sgst, igst in Invoice.sum_tax_by_rate(start_date, end_date):
+            rate_wise[rate] = {
+                'taxable': taxable,
+                'cgst': cgst,
+                'sgst': sgst,
+                'igst': igst
+            }
 
         return {
             'start_date': start_date,
@@ -260,19 +256,16 @@ class InvoiceService:
         end_date = date.today()
         start_date = end_date - timedelta(days=days - 1)
 
-        # Get all invoices for the period
-        invoices = Invoice.get_by_date_range(start_date, end_date)
-
         # Group by date
         daily_data = {}
         for i in range(days):
             d = start_date + timedelta(days=i)
             daily_data[d] = {'date': d, 'total': 0.0, 'count': 0}
 
-        for inv in invoices:
-            if not inv.is_cancelled and inv.invoice_date in daily_data:
-                daily_data[inv.invoice_date]['total'] += inv.grand_total
-                daily_data[inv.invoice_date]['count'] += 1
+        for day, count, sales, _ in Invoice.sum_by_date_range(start_date, end_date, "invoice_date"):
+            if day in daily_data:
+                daily_data[day]['total'] += sales
+                daily_data[day]['count'] += count
 
         # Convert to sorted list
         result = sorted(daily_data.values(), key=lambda x: x['date'])
@@ -289,15 +282,10 @@ class InvoiceService:
         Returns:
             Dict with payment mode as key and total amount as value
         """
-        invoices = Invoice.get_by_date_range(start_date, end_date)
-
         distribution = {}
-        for inv in invoices:
-            if not inv.is_cancelled:
-                mode = inv.payment_mode or "CASH"
-                if mode not in distribution:
-                    distribution[mode] = 0.0
-                distribution[mode] += inv.grand_total
+        for mode, _, sales, _ in Invoice.sum_by_date_range(start_date, end_date, "payment_mode"):
+            mode = mode or "CASH"
+            distribution[mode] = distribution.get(mode, 0.0) + sales
 
         # Round values
         for mode in distribution:
@@ -3,6 +3,7 @@ from datetime import date
 from typing import List, Optional, Dict
 from database.models import Invoice, InvoicePayment, Customer
 from database.db import get_connection
+from database.writer import writer
 
 
 class PaymentService:
@@ -127,38 +128,33 @@ class PaymentService:
         conn = get_connection()
         if customer_id:
             rows = conn.execute("""
-                SELECT * FROM invoices
+                SELECT id FROM invoices
                 WHERE balance_due > 0 AND is_cancelled = 0 AND customer_id = ?
                 ORDER BY invoice_date DESC
             """, (customer_id,)).fetchall()
         else:
             rows = conn.execute("""
-                SELECT * FROM invoices
+                SELECT id FROM invoices
                 WHERE balance_due > 0 AND is_cancelled = 0
                 ORDER BY invoice_date DESC
             """).fetchall()
-        conn.close()
         return [Invoice.get_by_id(row['id']) for row in rows]
 
     def get_payment_summary(self, start_date: date, end_date: date) -> Dict:
         """Get payment summary by mode for a date range"""
-        payments = InvoicePayment.get_by_date_range(start_date, end_date)
-
         summary = {
             'total': 0,
             'by_mode': {},
-            'count': len(payments)
+            'count': 0
         }
 
-        for payment in payments:
-            summary['total'] += payment.amount
-            if payment.payment_mode not in summary['by_mode']:
-                summary['by_mode'][payment.payment_mode] = {
-                    'amount': 0,
-                    'count': 0
-                }
-            summary['by_mode'][payment.payment_mode]['amount'] += payment.amount
-            summary['by_mode'][payment.payment_mode]['count'] += 1
+        for mode, count, amount in InvoicePayment.sum_by_mode(start_date, end_date):
+            summary['count'] += count
+            summary['total'] += amount
+            summary['by_mode'][mode] = {
+                'amount': amount,
+                'count': count
+            }
 
         return summary
 
@@ -174,9 +170,10 @@ class PaymentService:
     def delete_payment(self, payment_id: int) -> bool:
         """Delete a payment record and update invoice totals"""
         conn = get_connection()
-        row = conn.execute("SELECT * FROM invoice_payments WHERE id = ?", (payment_id,)).fetchone()
+        row = conn.execute(
+            "SELECT invoice_id, payment_mode, amount FROM invoice_payments WHERE id = ?", (payment_id,)
+        ).fetchone()
         if not row:
-            conn.close()
             return False
 
         invoice_id = row['invoice_id']
@@ -184,9 +181,7 @@ class PaymentService:
         amount = row['amount']
 
         # Delete the payment
-        conn.execute("DELETE FROM invoice_payments WHERE id = ?", (payment_id,))
-        conn.commit()
-        conn.close()
+        writer.execute("DELETE FROM invoice_payments WHERE id = ?", (payment_id,))
 
         # Update invoice totals
         self._update_invoice_payment_totals(invoice_id)
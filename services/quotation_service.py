@@ -324,23 +324,12 @@ class QuotationService:
 
     def get_quotation_summary(self, start_date: date, end_date: date) -> Dict:
         """Get summary statistics for quotations in date range"""
-        quotations = Quotation.get_by_date_range(start_date, end_date)
+        stats = Quotation.stats_by_date_range(start_date, end_date)
 
-        total_count = len(quotations)
-        total_value = 0
-        by_status = {}
-        converted_count = 0
-
-        for q in quotations:
-            total_value += q.grand_total
-
-            if q.status not in by_status:
-                by_status[q.status] = {'count': 0, 'value': 0}
-            by_status[q.status]['count'] += 1
-            by_status[q.status]['value'] += q.grand_total
-
-            if q.status == 'CONVERTED':
-                converted_count += 1
+        by_status = {status: {'count': count, 'value': value} for status, (count, value) in stats.items()}
+        total_count = sum(count for count, _ in stats.values())
+        total_value = sum(value for _, value in stats.values())
+        converted_count = stats.get('CONVERTED', (0, 0))[0]
 
         conversion_rate = (converted_count / total_count * 100) if total_count > 0 else 0
 
@@ -354,36 +343,10 @@ class QuotationService:
             'conversion_rate': round(conversion_rate, 1)
         }
 
-    def check_expired_quotations(self) -> List[Quotation]:
-        """Check and mark expired quotations"""
-        today = date.today()
-
-        # Get quotations that should be expired (past validity, still active)
-        from database.db import get_connection
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT id FROM quotations
-            WHERE validity_date < ? AND status IN ('DRAFT', 'SENT')
-        """, (today.isoformat(),)).fetchall()
-        conn.close()
-
-        expired = []
-        for row in rows:
-            quotation = Quotation.get_by_id(row['id'])
-            if quotation:
-                quotation.update_status('EXPIRED')
-                expired.append(quotation)
-
-        return expired
+    def check_expired_quotations(self) -> int:
+        """Mark expired quotations, returning how many were expired"""
+        return Quotation.expire_stale()
 
     def get_pending_quotations(self) -> List[Quotation]:
         """Get quotations awaiting response (SENT status)"""
-        from database.db import get_connection
-        conn = get_connection()
-        rows = conn.execute("""
-            SELECT id FROM quotations
-            WHERE status = 'SENT'
-            ORDER BY validity_date
-        """).fetchall()
-        conn.close()
-        return [Quotation.get_by_id(row['id']) for row in rows]
+        return Quotation.get_by_status('SENT')
@@ -92,14 +92,19 @@ class StockService:
         return True
 
     @staticmethod
-    def get_low_stock_products() -> List[Product]:
+    def get_low_stock_products(limit: Optional[int] = None) -> List[Product]:
         """Get products with stock below alert level"""
-        return Product.get_low_stock()
+        return Product.get_low_stock(limit)
+
+    @staticmethod
+    def count_low_stock_products() -> int:
+        """Count products with stock below alert level"""
+        return Product.count_low_stock()
 
     @staticmethod
     def get_stock_report() -> List[dict]:
         """Get stock report for all products"""
-        products = Product.get_all(active_only=True)
+        products = Product.iter_all(active_only=True)
 
         report = []
         for p in products:
@@ -137,7 +142,7 @@ class StockService:
     @staticmethod
     def get_stock_history(product_id: int) -> List[dict]:
         """Get stock movement history for a product"""
-        logs = StockLog.get_by_product(product_id)
+        logs = StockLog.iter_by_product(product_id)
 
         history = []
         for log in logs:
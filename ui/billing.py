@@ -767,9 +767,8 @@ class BillingFrame(ctk.CTkFrame):
             return
 
         from database.models import HeldBill
-        import json
 
-        # Build items JSON
+        # Build held items
         items = []
         for item in self.cart:
             items.append({
@@ -787,9 +786,9 @@ class BillingFrame(ctk.CTkFrame):
             hold_name=f"Bill #{len(HeldBill.get_all()) + 1}",
             customer_id=self.selected_customer.id if self.selected_customer else None,
             customer_name=self.selected_customer.name if self.selected_customer else "Cash Customer",
-            items_json=json.dumps(items),
             discount=discount
         )
+        held_bill.items = items
         held_bill.save()
 
         messagebox.showinfo("Bill Held", f"Bill held as '{held_bill.hold_name}'.\nPress F6 to recall.")
@@ -798,7 +797,6 @@ class BillingFrame(ctk.CTkFrame):
     def _recall_bill(self):
         """Recall a held bill (F6)"""
         from database.models import HeldBill
-        import json
 
         held_bills = HeldBill.get_all()
         if not held_bills:
@@ -824,8 +822,7 @@ class BillingFrame(ctk.CTkFrame):
         def recall_selected(bill):
             # Load cart from held bill
             self._clear_cart()
-            items = json.loads(bill.items_json)
-            for item_data in items:
+            for item_data in bill.items:
                 product = Product.get_by_id(item_data['product_id'])
                 if product:
                     self._add_to_cart(product, item_data['qty'])
@@ -941,7 +938,7 @@ class BillingFrame(ctk.CTkFrame):
         mode_var = ctk.StringVar(value="CASH")
         mode_combo = ctk.CTkComboBox(
             row_frame,
-            values=PAYMENT_MODES,
+            values=list(PAYMENT_MODES),
             variable=mode_var,
             width=100,
             height=28
@@ -1,6 +1,7 @@
 """Dashboard screen with quick stats and charts"""
 import customtkinter as ctk
 from datetime import date, timedelta
+from itertools import islice
 from database.models import Invoice
 from services.invoice_service import InvoiceService
 from services.stock_service import StockService
@@ -422,8 +423,7 @@ class DashboardFrame(ctk.CTkFrame):
         )
 
         # Low stock
-        low_stock = self.stock_service.get_low_stock_products()
-        self.low_stock_card['value'].configure(text=str(len(low_stock)))
+        self.low_stock_card['value'].configure(text=str(self.stock_service.count_low_stock_products()))
 
         # Update charts
         self._update_charts()
@@ -432,9 +432,10 @@ class DashboardFrame(ctk.CTkFrame):
         for widget in self.recent_invoices_list.winfo_children():
             widget.destroy()
 
-        recent_invoices = Invoice.get_by_date_range(today - timedelta(days=7), today)
+        # Only the latest 10 are shown, so stop reading after them
+        recent_invoices = list(islice(Invoice.iter_by_date_range(today - timedelta(days=7), today), 10))
         if recent_invoices:
-            for inv in recent_invoices[:10]:  # Show last 10
+            for inv in recent_invoices:
                 item_frame = ctk.CTkFrame(self.recent_invoices_list, fg_color="transparent")
                 item_frame.pack(fill="x", pady=2)
                 item_frame.grid_columnconfigure(1, weight=1)
@@ -469,8 +470,9 @@ class DashboardFrame(ctk.CTkFrame):
         for widget in self.low_stock_list.winfo_children():
             widget.destroy()
 
+        low_stock = self.stock_service.get_low_stock_products(limit=10)
         if low_stock:
-            for product in low_stock[:10]:  # Show top 10
+            for product in low_stock:
                 item_frame = ctk.CTkFrame(self.low_stock_list, fg_color="transparent")
                 item_frame.pack(fill="x", pady=2)
 
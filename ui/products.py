@@ -235,7 +235,7 @@ class ProductDialog(ctk.CTkToplevel):
         unit_frame.pack(side="left", fill="x", expand=True)
         ctk.CTkLabel(unit_frame, text="Unit").pack(anchor="w")
         self.unit_var = ctk.StringVar(value="NOS")
-        ctk.CTkComboBox(unit_frame, variable=self.unit_var, values=UNITS, width=180).pack()
+        ctk.CTkComboBox(unit_frame, variable=self.unit_var, values=list(UNITS), width=180).pack()
 
         # Initial Stock (only for new products)
         if not self.product:
@@ -516,7 +516,7 @@ class QuotationsFrame(ctk.CTkFrame):
         status_filter = self.status_filter_var.get()
         status = None if status_filter == "All" else status_filter
 
-        quotations = Quotation.get_by_date_range(from_date, to_date, status)
+        quotations = Quotation.get_headers_by_date_range(from_date, to_date, status)
 
         if not quotations:
             ctk.CTkLabel(
@@ -582,7 +582,7 @@ class QuotationsFrame(ctk.CTkFrame):
                 width=50,
                 height=25,
                 font=ctk.CTkFont(size=11),
-                command=lambda qid=q.id: self._view_quotation(qid)
+                command=lambda q=q: self._view_quotation(q)
             ).pack(side="left", padx=2)
 
             if q.status in ('DRAFT', 'SENT'):
@@ -628,11 +628,10 @@ class QuotationsFrame(ctk.CTkFrame):
                 command=lambda qid=q.id: self._save_quotation_pdf(qid)
             ).pack(side="left", padx=2)
 
-    def _view_quotation(self, quotation_id: int):
+    def _view_quotation(self, quotation: Quotation):
         """View quotation details in popup"""
-        quotation = Quotation.get_by_id(quotation_id)
-        if not quotation:
-            return
+        # List rows are headers only; fetch just the items instead of the whole quotation
+        quotation.load_items()
 
         # Create popup window
         popup = ctk.CTkToplevel(self)
@@ -803,7 +802,7 @@ class QuotationsFrame(ctk.CTkFrame):
         if expired:
             messagebox.showinfo(
                 "Expired Quotations",
-                f"{len(expired)} quotation(s) have been marked as EXPIRED"
+                f"{expired} quotation(s) have been marked as EXPIRED"
             )
             self._load_quotations()
         else: